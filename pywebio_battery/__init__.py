@@ -23,6 +23,9 @@ Interaction related
    * - `file_picker <pywebio_battery.file_picker>`
      - Local file picker
 
+   * - `open_file <pywebio_battery.open_file>`, `split_archive_path <pywebio_battery.split_archive_path>`
+     - Read the file selected by the file picker, which may be a member of an archive
+
    * - `confirm <pywebio_battery.confirm>`
      - Confirmation modal
 
@@ -32,17 +35,31 @@ Interaction related
    * - `redirect_stdout <pywebio_battery.redirect_stdout>`
      - redirecting stdout to pywebio
 
-   * - `run_shell <pywebio_battery.run_shell>`
+   * - `run_shell <pywebio_battery.run_shell>`, `run_shell_async <pywebio_battery.run_shell_async>`
      - Run command in shell
 
-   * - `put_logbox <pywebio_battery.put_logbox>`, `logbox_append <pywebio_battery.logbox_append>`, `logbox_clear <pywebio_battery.logbox_clear>`
+   * - `set_shell_concurrency <pywebio_battery.set_shell_concurrency>`,
+       `get_shell_queue_stats <pywebio_battery.get_shell_queue_stats>`
+     - Limit the concurrent shell commands
+
+   * - `put_logbox <pywebio_battery.put_logbox>`, `logbox_append <pywebio_battery.logbox_append>`, `logbox_clear <pywebio_battery.logbox_clear>`,
+       `logbox_flush <pywebio_battery.logbox_flush>`
      - Logbox widget
 
    * - `put_video <pywebio_battery.put_video>`
      - Output video
 
+   * - `put_video_stream <pywebio_battery.put_video_stream>`,
+       `video_stream_append <pywebio_battery.video_stream_append>`,
+       `video_stream_append_async <pywebio_battery.video_stream_append_async>`,
+       `video_stream_end <pywebio_battery.video_stream_end>`
+     - Output video generated on the fly
+
    * - `put_audio <pywebio_battery.put_audio>`
      - Output audio
+
+   * - `config_media_server <pywebio_battery.config_media_server>`, `MediaHandler <pywebio_battery.MediaHandler>`
+     - Media server for local video/audio files
    
    * - `wait_scroll_to_bottom <pywebio_battery.wait_scroll_to_bottom>`
      - Wait the page is scrolled to bottom
@@ -55,26 +72,36 @@ Web application related
    * - Function name
      - Description
 
-   * - `get_all_query <pywebio_battery.get_all_query>`, `get_query <pywebio_battery.get_query>`
+   * - `get_all_query <pywebio_battery.get_all_query>`, `get_query <pywebio_battery.get_query>`,
+       `refresh_query <pywebio_battery.refresh_query>`
      - Get URL parameter
 
-   * - `set_localstorage <pywebio_battery.set_localstorage>`, `get_localstorage <pywebio_battery.get_localstorage>`
+   * - `set_localstorage <pywebio_battery.set_localstorage>`, `get_localstorage <pywebio_battery.get_localstorage>`,
+       `set_localstorage_many <pywebio_battery.set_localstorage_many>`,
+       `get_localstorage_many <pywebio_battery.get_localstorage_many>`, `local_state <pywebio_battery.local_state>`
      - User browser storage
 
-   * - `set_cookie <pywebio_battery.set_cookie>`, `get_cookie <pywebio_battery.get_cookie>`
+   * - `set_cookie <pywebio_battery.set_cookie>`, `get_cookie <pywebio_battery.get_cookie>`,
+       `set_cookie_many <pywebio_battery.set_cookie_many>`, `get_cookie_many <pywebio_battery.get_cookie_many>`
      - Web Cookie
 
    * - `basic_auth <pywebio_battery.basic_auth>`, `custom_auth <pywebio_battery.custom_auth>`,
        `revoke_auth <pywebio_battery.revoke_auth>`
      - Authentication
 
+   * - `config_auth <pywebio_battery.config_auth>`, `MemoryRevocationStore <pywebio_battery.MemoryRevocationStore>`,
+       `FileRevocationStore <pywebio_battery.FileRevocationStore>`
+     - Server side state of authentication
+
 """
 from .interaction import *
+from .media import *
 from .web import *
-from .file_picker import file_picker
+from .file_picker import file_picker, open_file, split_archive_path
 
 # make Sphinx can auto generate API docs for this package
 from .interaction import __all__ as interaction_all
+from .media import __all__ as media_all
 from .web import __all__ as web_all
 
-__all__ = ['file_picker'] + interaction_all + web_all
+__all__ = ['file_picker', 'open_file', 'split_archive_path'] + interaction_all + media_all + web_all
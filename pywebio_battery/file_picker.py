@@ -1,17 +1,627 @@
+import bisect
+import functools
+import hashlib
+import io
+import itertools
+import mimetypes
 import os.path
 import pathlib
+import shutil
+import sqlite3
+import subprocess
+import tarfile
+import threading
+import time
 import typing
-from datetime import datetime
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
 
 from pywebio.io_ctrl import output_register_callback
 from pywebio.output import *
 from pywebio.output import _put_message
 from pywebio.pin import *
 from pywebio.session import run_js, eval_js
-from pywebio.session import set_env
+from pywebio.session import set_env, register_thread, get_current_session
 from pywebio.utils import random_str
 
 
+@functools.lru_cache(maxsize=4096)
+def _format_timestamp(timestamp: int) -> str:
+    return "%04d-%02d-%02d %02d:%02d:%02d" % time.localtime(timestamp)[:6]
+
+
+def scan_dir(path: typing.Union[str, pathlib.Path], accept: typing.Union[str, typing.Tuple[str, ...]] = '',
+             show_hidden_files: bool = False, files: typing.List[dict] = None,
+             cancel: threading.Event = None) -> typing.List[dict]:
+    """List the directory for `FilePicker`, return the rows of the datatable.
+    Besides the columns, the rows also have ``is_dir``, ``bytes`` (the file size) and ``mtime`` keys as metadata.
+
+    Use `os.scandir()` to get the file type without extra syscall, and stat each entry at most once.
+
+    The rows are appended to ``files`` as they are scanned, so that other threads can read the partial listing.
+    The scanning stops early when ``cancel`` is set.
+    """
+    files = [] if files is None else files
+    with os.scandir(path) as it:
+        for entry in it:
+            if cancel is not None and cancel.is_set():
+                break
+            if not show_hidden_files and entry.name.startswith('.'):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir and not entry.name.lower().endswith(accept):
+                continue
+            file = {
+                "id": entry.path,
+                "name": f"📁 {entry.name}/" if is_dir else entry.name,
+                "is_dir": is_dir,
+            }
+            try:
+                stat = entry.stat()
+                file.update({
+                    "bytes": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "size": '--' if is_dir else FilePicker.readable_size(stat.st_size),
+                    "date_modified": _format_timestamp(int(stat.st_mtime)),
+                })
+            except OSError:
+                pass
+            files.append(file)
+
+    return sort_rows(files)
+
+
+def sort_rows(files: typing.List[dict]) -> typing.List[dict]:
+    """Return the rows sorted by name, folders first"""
+    return sorted(files, key=lambda f: (not f["is_dir"], f["name"].lower()))
+
+
+class DirListingCache:
+    """Process-wide LRU cache of the directory listings of `FilePicker`, shared by all sessions.
+
+    A cached listing is invalid when the modification time of the directory changes (i.e. an entry is added,
+    removed or renamed) or it's older than ``ttl`` seconds (to pick up the size/date change of the files).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (dir mtime, cache time, rows)
+        self._lock = threading.Lock()
+
+    def get(self, path: typing.Union[str, pathlib.Path], accept, show_hidden_files: bool,
+            files: typing.List[dict] = None, cancel: threading.Event = None) -> typing.List[dict]:
+        """Get the listing of the directory, the returned list must not be modified.
+
+        ``files`` and ``cancel`` are passed to `scan_dir()` on cache miss, a cancelled listing is not cached.
+        """
+        path = os.path.abspath(path)
+        key = (path, accept, show_hidden_files)
+        mtime = os.stat(path).st_mtime_ns
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime and now - entry[1] < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[2]
+            self.misses += 1
+
+        rows = scan_dir(path, accept, show_hidden_files, files, cancel)
+        if cancel is not None and cancel.is_set():
+            return rows
+        with self._lock:
+            self._entries[key] = (mtime, now, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, entries=len(self._entries))
+
+
+listing_cache = DirListingCache()
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# the errors raised when reading a corrupted or unreadable archive
+ARCHIVE_ERRORS = (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError)
+
+
+class ArchiveIndex:
+    """Index of the members of a zip/tar archive, so that `FilePicker` can browse the archive as a folder.
+
+    The index of zip archive is built from its central directory, and the index of tar archive is built from the
+    member headers, no member data is decompressed. But a compressed tar archive (e.g. ``.tar.gz``) has no index
+    of its members, it has to be decompressed entirely once to build the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dirs = {'': {}}  # folder path in archive -> {name: (is_dir, size, mtime)}
+        self.names = {}  # file path in archive -> member name in archive, e.g. 'a/b' -> './a/b'
+        if path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    self._add(info.filename, info.is_dir(), info.file_size, time.mktime(info.date_time + (0, 0, -1)))
+        else:
+            with tarfile.open(path) as tf:
+                for member in tf:
+                    if member.isfile() or member.isdir():
+                        self._add(member.name, member.isdir(), member.size, member.mtime)
+
+    def _add(self, name: str, is_dir: bool, size: int, mtime: float):
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+        if not parts or '..' in parts:
+            return
+        if not is_dir:
+            self.names['/'.join(parts)] = name
+        for i in range(len(parts)):  # the parent folders may not be in the archive
+            folder = self.dirs.setdefault('/'.join(parts[:i]), {})
+            if i < len(parts) - 1:
+                folder.setdefault(parts[i], (True, 0, mtime))
+            else:
+                folder[parts[i]] = (is_dir, size, mtime)
+        if is_dir:
+            self.dirs.setdefault('/'.join(parts), {})
+
+    def is_dir(self, member: str) -> bool:
+        return member in self.dirs
+
+    def is_file(self, member: str) -> bool:
+        folder, _, name = member.rpartition('/')
+        entry = self.dirs.get(folder, {}).get(name)
+        return entry is not None and not entry[0]
+
+
+_archive_indexes = OrderedDict()  # archive path -> ((mtime, size), ArchiveIndex)
+_archive_indexes_lock = threading.Lock()
+
+
+def get_archive_index(path: str, max_entries: int = 32) -> ArchiveIndex:
+    """Get the index of the archive, the index is cached until the archive is modified"""
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _archive_indexes_lock:
+        cached = _archive_indexes.get(path)
+        if cached is not None and cached[0] == version:
+            _archive_indexes.move_to_end(path)
+            return cached[1]
+    index = ArchiveIndex(path)
+    with _archive_indexes_lock:
+        _archive_indexes[path] = (version, index)
+        _archive_indexes.move_to_end(path)
+        while len(_archive_indexes) > max_entries:
+            _archive_indexes.popitem(last=False)
+    return index
+
+
+def split_archive_path(path: typing.Union[str, pathlib.Path]) -> typing.Optional[typing.Tuple[str, str]]:
+    """Split the path of a member in an archive (e.g. ``/data/archive.zip/folder/file.txt``) to
+    ``(archive path, member path)``, return ``None`` if the path is not in an archive."""
+    parts = pathlib.PurePath(path).parts
+    for i in range(1, len(parts) + 1):
+        if parts[i - 1].lower().endswith(ARCHIVE_SUFFIXES):
+            archive = os.path.join(*parts[:i])
+            if os.path.isfile(archive):
+                return archive, '/'.join(parts[i:])
+    return None
+
+
+def scan_archive(archive: str, member: str, accept: typing.Union[str, typing.Tuple[str, ...]] = '',
+                 show_hidden_files: bool = False) -> typing.List[dict]:
+    """List the folder in the archive, return the rows of the datatable in the same format as `scan_dir()`"""
+    files = []
+    for name, (is_dir, size, mtime) in get_archive_index(archive).dirs.get(member, {}).items():
+        if not show_hidden_files and name.startswith('.'):
+            continue
+        if not is_dir and not name.lower().endswith(accept):
+            continue
+        files.append({
+            "id": os.path.join(archive, member, name),
+            "name": f"📁 {name}/" if is_dir else name,
+            "is_dir": is_dir,
+            "size": '--' if is_dir else FilePicker.readable_size(size),
+            "bytes": size,
+            "date_modified": _format_timestamp(int(mtime)),
+        })
+    return sort_rows(files)
+
+
+class _TarMemberFile(tarfile.ExFileObject):
+    """A member file of tar archive which closes the archive when it's closed"""
+
+    def __init__(self, archive: tarfile.TarFile, tarinfo: tarfile.TarInfo):
+        super().__init__(archive, tarinfo)
+        self.archive = archive
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.archive.close()
+
+
+def open_file(path: typing.Union[str, pathlib.Path]) -> typing.BinaryIO:
+    """Open the file selected by `file_picker()` for reading in binary mode,
+    the file can be a member of an archive when ``browse_archives=True`` is used in `file_picker()`."""
+    if os.path.isfile(path):
+        return open(path, 'rb')
+    location = split_archive_path(path)
+    if location is None:
+        raise FileNotFoundError(path)
+    archive, member = location
+    name = get_archive_index(archive).names.get(member)
+    if name is None:
+        raise FileNotFoundError(path)
+    if archive.lower().endswith('.zip'):
+        # the archive file is closed when both the ZipFile and the member file are closed
+        with zipfile.ZipFile(archive) as zf:
+            return zf.open(name)
+    tf = tarfile.open(archive)
+    tf.fileobject = _TarMemberFile
+    try:
+        fileobj = tf.extractfile(name)
+    except BaseException:
+        tf.close()
+        raise
+    if fileobj is None:
+        tf.close()
+        raise FileNotFoundError(path)
+    return fileobj
+
+
+# The directories are listed in the worker threads, so that a slow filesystem (e.g. a network mount)
+# doesn't block the session
+_scan_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='pywebio_battery_file_picker')
+# The sub folders are prefetched in a separate smaller pool, so the prefetching doesn't delay the listings
+# requested by the users
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pywebio_battery_file_picker_prefetch')
+
+
+class SearchIndex:
+    """In-memory index of the file names in a folder tree, used by the search box of `FilePicker`.
+
+    The index is built in a background thread. On refresh, only the directories whose modification time changed
+    are listed again, the others reuse the entries of the last build.
+
+    The names are kept in a sorted array for prefix search (binary search), and are joined into a single string
+    for substring search (`str.find()`), so the search doesn't need to iterate over the names in Python.
+    """
+
+    def __init__(self, root: str, show_hidden_files: bool = False, max_entries: int = 2_000_000):
+        self.root = root
+        self.show_hidden_files = show_hidden_files
+        self.max_entries = max_entries
+        self.ready = False  # whether the first build is finished
+        self.truncated = False  # whether the tree has more than `max_entries` entries
+        self.refreshed_at = float('-inf')
+        self._dirs = {}  # dir path -> (mtime, [(name, is_dir)])
+        # (paths, is_dirs, sorted_names, sorted_ids, joined_names, offsets), replaced as a whole on refresh
+        self._snapshot = ([], [], [], [], '', [])
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def refresh_async(self, min_interval: float = 30):
+        """Refresh the index in background if it's not refreshed in ``min_interval`` seconds"""
+        with self._lock:
+            if self._refreshing or time.monotonic() - self.refreshed_at < min_interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, daemon=True, name='pywebio_battery_search_index').start()
+
+    def _list_dir(self, path: str) -> typing.List[typing.Tuple[str, bool]]:
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if not self.show_hidden_files and entry.name.startswith('.'):
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+        return entries
+
+    def refresh(self):
+        try:
+            dirs, paths, is_dirs, truncated = {}, [], [], False
+            stack = [self.root]
+            while stack and not truncated:
+                path = stack.pop()
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    cached = self._dirs.get(path)
+                    entries = cached[1] if cached and cached[0] == mtime else self._list_dir(path)
+                except OSError:
+                    continue
+                dirs[path] = (mtime, entries)
+                for name, is_dir in entries:
+                    child = os.path.join(path, name)
+                    paths.append(child)
+                    is_dirs.append(is_dir)
+                    if is_dir:
+                        stack.append(child)
+                truncated = len(paths) >= self.max_entries
+
+            names = [os.path.basename(p).lower() for p in paths]
+            sorted_ids = sorted(range(len(names)), key=names.__getitem__)
+            sorted_names = [names[i] for i in sorted_ids]
+            offsets, offset = [], 0
+            for name in names:
+                offsets.append(offset)
+                offset += len(name) + 1
+            self._dirs = dirs
+            self._snapshot = (paths, is_dirs, sorted_names, sorted_ids, '\n'.join(names), offsets)
+            self.truncated = truncated
+            self.ready = True
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self.refreshed_at = time.monotonic()
+
+    def search(self, query: str, accept: typing.Union[str, typing.Tuple[str, ...]] = '',
+               limit: int = 1000) -> typing.List[typing.Tuple[str, bool]]:
+        """Return the ``(path, is_dir)`` of the entries whose name contains ``query`` (case-insensitive),
+        the entries whose name starts with ``query`` come first."""
+        query = query.lower().replace('\n', '')
+        paths, is_dirs, sorted_names, sorted_ids, joined, offsets = self._snapshot
+        if not query:
+            return []
+
+        results, seen = [], set()
+
+        def add(idx):
+            if idx not in seen and (is_dirs[idx] or paths[idx].lower().endswith(accept)):
+                seen.add(idx)
+                results.append((paths[idx], is_dirs[idx]))
+
+        pos = bisect.bisect_left(sorted_names, query)
+        while pos < len(sorted_names) and sorted_names[pos].startswith(query) and len(results) < limit:
+            add(sorted_ids[pos])
+            pos += 1
+
+        pos = joined.find(query)
+        while pos != -1 and len(results) < limit:
+            idx = bisect.bisect_right(offsets, pos) - 1
+            add(idx)
+            pos = joined.find(query, offsets[idx + 1] if idx + 1 < len(offsets) else len(joined))
+        return results
+
+
+_search_indexes = OrderedDict()  # (root, show_hidden_files) -> SearchIndex
+_search_indexes_lock = threading.Lock()
+
+
+def get_search_index(root: typing.Union[str, pathlib.Path], show_hidden_files: bool = False,
+                     max_entries: int = 8) -> SearchIndex:
+    """Get the search index of the folder tree, the index is shared by the file pickers with the same root"""
+    key = (os.path.abspath(root), show_hidden_files)
+    with _search_indexes_lock:
+        if key not in _search_indexes:
+            _search_indexes[key] = SearchIndex(*key)
+        _search_indexes.move_to_end(key)
+        while len(_search_indexes) > max_entries:  # the least recently used indexes are dropped
+            _search_indexes.popitem(last=False)
+        return _search_indexes[key]
+
+
+class FolderSizeCache:
+    """Persistent cache of the folder sizes of `FilePicker`, stored in a SQLite database.
+
+    For each folder, the total size of the files directly in it and the names of its sub folders are cached,
+    keyed by its path and modification time. When computing the size of a folder tree, the folders whose
+    modification time is unchanged are not scanned again, only their sub folders are checked (a ``stat()`` call
+    per folder), so a change anywhere in the tree is picked up.
+    A folder's modification time doesn't change when a file in it is modified in place,
+    so the cached entries expire after ``max_age`` seconds.
+    """
+
+    def __init__(self, path: str = None, max_age: float = 24 * 3600):
+        self.path = path or os.path.join(os.path.expanduser('~'), '.cache', 'pywebio_battery', 'folder_sizes.db')
+        self.max_age = max_age
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            schema = 'CREATE TABLE IF NOT EXISTS folder_entries (path TEXT PRIMARY KEY, mtime INTEGER, ' \
+                     'files_size INTEGER, sub_folders TEXT, updated REAL)'
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(schema)
+            except (OSError, sqlite3.Error):  # e.g. read-only home directory
+                self._db = sqlite3.connect(':memory:', check_same_thread=False)
+                self._db.execute(schema)
+            self._db.execute('DELETE FROM folder_entries WHERE updated < ?', (time.time() - self.max_age,))
+            self._db.commit()
+        return self._db
+
+    def _get(self, path: str, mtime: int) -> typing.Optional[typing.Tuple[int, typing.List[str]]]:
+        """Return the cached size of the files in the folder and the names of its sub folders"""
+        with self._lock:
+            row = self._connect().execute('SELECT files_size, sub_folders FROM folder_entries '
+                                          'WHERE path=? AND mtime=? AND updated>=?',
+                                          (path, mtime, time.time() - self.max_age)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1].split('/') if row[1] else []
+
+    def compute(self, path: str, cancel: threading.Event = None) -> typing.Optional[int]:
+        """Compute the size of the folder, return ``None`` when cancelled"""
+        results = []
+        size = self._compute(path, results, cancel)
+        if results:
+            with self._lock:
+                db = self._connect()
+                db.executemany('INSERT OR REPLACE INTO folder_entries VALUES (?, ?, ?, ?, ?)', results)
+                db.commit()
+        return size
+
+    def _compute(self, path: str, results: list, cancel: threading.Event = None) -> typing.Optional[int]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            cached = self._get(path, mtime)
+            if cached is not None:
+                size, sub_folders = cached
+            else:
+                size, sub_folders = 0, []
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if cancel is not None and cancel.is_set():
+                            return None
+                        if entry.is_dir(follow_symlinks=False):
+                            sub_folders.append(entry.name)
+                        else:
+                            size += entry.stat(follow_symlinks=False).st_size
+                results.append((path, mtime, size, '/'.join(sub_folders), time.time()))
+        except OSError:  # no permission or removed, count as empty
+            return 0
+        for name in sub_folders:
+            if cancel is not None and cancel.is_set():
+                return None
+            sub_size = self._compute(os.path.join(path, name), results, cancel)
+            if sub_size is None:
+                return None
+            size += sub_size
+        return size
+
+
+folder_size_cache = FolderSizeCache()
+_size_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pywebio_battery_folder_size')
+
+
+class ThumbnailCache:
+    """On-disk cache of the thumbnails of the preview pane of `FilePicker`.
+
+    The thumbnail of a file is keyed by the path, modification time and size of the file, so a modified file gets
+    a new thumbnail. The least recently used thumbnails are removed when the total size exceeds ``max_size`` bytes.
+
+    The thumbnails of images are generated with `Pillow <https://pypi.org/project/Pillow/>`_, and the thumbnails of
+    videos are generated with `ffmpeg <https://ffmpeg.org/>`_, no thumbnail is available if they are not installed.
+    """
+
+    def __init__(self, path: str = None, max_size: int = 256 * 1024 * 1024, thumbnail_size: int = 256):
+        self.path = path or os.path.join(os.path.expanduser('~'), '.cache', 'pywebio_battery', 'thumbnails')
+        self.max_size = max_size
+        self.thumbnail_size = thumbnail_size
+        self._size = None  # total size of the cached thumbnails, computed on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def kind(path: str) -> typing.Optional[str]:
+        """Return ``'image'`` or ``'video'`` if a thumbnail can be generated for the file"""
+        mime_type = mimetypes.guess_type(path)[0] or ''
+        if mime_type.startswith('image/'):
+            try:
+                import PIL.Image  # noqa
+            except ImportError:
+                return None
+            return 'image'
+        if mime_type.startswith('video/') and shutil.which('ffmpeg'):
+            return 'video'
+        return None
+
+    def get(self, path: str) -> typing.Optional[bytes]:
+        """Get the JPEG thumbnail of the file, generate it if not cached. Return ``None`` if not available"""
+        kind = self.kind(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if kind is None:
+            return None
+        key = hashlib.sha1(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}".encode('utf8', 'surrogateescape'))
+        cache_file = os.path.join(self.path, key.hexdigest() + '.jpg')
+        try:
+            with open(cache_file, 'rb') as f:
+                data = f.read()
+            os.utime(cache_file)  # mark as recently used
+            return data
+        except OSError:
+            pass
+
+        try:
+            data = self._generate_image(path) if kind == 'image' else self._generate_video(path)
+        except Exception:  # unsupported or broken file
+            return None
+        if data:
+            self._save(cache_file, data)
+        return data
+
+    def _generate_image(self, path: str) -> bytes:
+        from PIL import Image
+        with Image.open(path) as img:
+            img.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            buf = io.BytesIO()
+            img.convert('RGB').save(buf, format='JPEG', quality=80)
+        return buf.getvalue()
+
+    def _generate_video(self, path: str) -> bytes:
+        proc = subprocess.run(
+            ['ffmpeg', '-v', 'error', '-ss', '1', '-i', path, '-frames:v', '1',
+             '-vf', f"scale='min({self.thumbnail_size},iw)':-2", '-f', 'image2pipe', '-vcodec', 'mjpeg', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30)
+        return proc.stdout
+
+    def _save(self, cache_file: str, data: bytes):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _entries(self) -> typing.List[typing.Tuple[float, str, int]]:
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used thumbnails until the total size is below 80% of the max size"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_size * 0.8:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+
+thumbnail_cache = ThumbnailCache()
+_thumbnail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pywebio_battery_thumbnail')
+
+
 class FilePicker:
     @staticmethod
     def readable_size(byte_size: int):
@@ -21,26 +631,77 @@ class FilePicker:
             byte_size /= 1024.0
         return f"{byte_size:.2f} PB"
 
+    columns = ['id', 'name', 'size', 'date_modified']
+    # the columns sorted by the raw values instead of the displayed text in lazy mode,
+    # the rows of archive members have no ``mtime``, but the displayed time is in the sortable ISO format
+    sort_keys = {
+        'size': lambda row: row.get('bytes') or 0,
+        'date_modified': lambda row: (row.get('date_modified', ''), row.get('mtime') or 0),
+    }
+
     def __init__(self, path: str = '/', multiple: bool = False,
-                 accept: typing.Union[str, typing.List[str]] = None, show_hidden_files: bool = False):
-        self.root_path = pathlib.Path(path).expanduser()
+                 accept: typing.Union[str, typing.List[str]] = None, show_hidden_files: bool = False,
+                 lazy: bool = False, page_size: int = 100, listing_timeout: float = 3, search: bool = False,
+                 folder_size: bool = False, browse_archives: bool = False, prefetch: int = 0,
+                 preview: bool = False):
+        self.path = pathlib.Path(path).expanduser()  # the root path given by user, used in the returned file paths
+        # the row ids of listing are absolute paths, so the root path must be absolute too
+        self.root_path = pathlib.Path(os.path.abspath(self.path))
         self.multiple = multiple
-        self.accept = accept if isinstance(accept, str) else tuple(accept)
+        self.accept = accept if isinstance(accept, str) else tuple(accept) if accept else ''
         self.show_hidden_files = show_hidden_files
         self.instance_id = 'file_picker_' + random_str(10)
-        self.selected_files = []
+        # insertion-ordered set of the selected files (relative to root), the value is the scope name of the file
+        self.selected_files: typing.Dict[str, str] = {}
+        self.collapsed = False  # whether the selected files are shown as a summary
+        # In lazy mode, the listing is kept in server side, and the datatable requests the rows page by page
+        self.lazy = lazy
+        self.page_size = page_size
+        self.rows = []
+        self.row_index = {}  # row id -> row, of the rows shown in the datatable
+        self.view_cache = {}  # (sort model, filter model) -> sorted and filtered rows
+        # When listing a directory takes longer than `listing_timeout` seconds, show the partial listing first
+        self.listing_timeout = listing_timeout
+        self.generation = 0  # increased on each navigation, the listings of the old generations are dropped
+        self.cancel_listing = threading.Event()
+        self.current_path = self.root_path
+        self.search = search
+        self.searching = False  # whether the datatable is showing the search results
+        self.folder_size = folder_size
+        self.browse_archives = browse_archives
+        self.listing_accept = self.accept
+        if browse_archives and self.accept:  # keep the archives in listing
+            self.listing_accept = (self.accept,) + ARCHIVE_SUFFIXES if isinstance(self.accept, str) \
+                else self.accept + ARCHIVE_SUFFIXES
+        self.prefetch = prefetch  # the max number of sub folders to list in advance
+        self.preview = preview
+        self.preview_seq = 0  # increased on each selection, the outdated thumbnails are dropped
 
         self.init()
 
     def init(self):
         callback_id = output_register_callback(self.change_dir_or_add_file)
         _put_message(color='secondary', contents=[
-            put_scope(f"{self.instance_id}_path")
+            put_scope(f"{self.instance_id}_path").style('display: inline;'),
+            put_scope(f"{self.instance_id}_loading").style('display: inline; margin-left: 8px;'),
         ]).style('font-size: 12px; padding: 8px 12px; margin-bottom: 8px;')
         self.show_path(self.root_path)
+        if self.search:
+            put_input(f"{self.instance_id}_search", placeholder="Search files in all sub folders")
+            pin_on_change(f"{self.instance_id}_search", onchange=self.search_files)
+
+        grid_args = {}
+        if self.lazy:
+            grid_args = {
+                "rowModelType": "infinite",
+                "cacheBlockSize": self.page_size,
+                "cacheOverflowSize": 1,  # allow one extra row after the last known row, to find more rows
+                "maxBlocksInCache": 10,
+            }
 
         put_datatable(
-            self.path_info(self.root_path),
+            [],
+            column_order=self.columns,
             id_field='id',
             multiple_select=self.multiple if self.multiple else None,
             onselect=self.on_select,
@@ -50,44 +711,135 @@ class FilePicker:
                 "date_modified": {"cellStyle": {"color": "grey"}}
             },
             grid_args={
-                "onCellDoubleClicked": JSFunction("event", f"WebIO.pushData(event.node.id, {callback_id!r})")
+                "onCellDoubleClicked": JSFunction("event", f"WebIO.pushData(event.node.id, {callback_id!r})"),
+                **grid_args
             },
             instance_id=self.instance_id,
             cell_content_bar=False,
         )
+        if self.lazy:
+            self.init_datasource()
         put_scope(f"{self.instance_id}-action_btn")
+        if self.preview:
+            put_scope(f"{self.instance_id}_preview").style('margin-top: 8px;')
         _put_message(color='secondary', contents=[
             put_markdown("**Selected Files** (click file name to unselect):").style("margin-bottom: 4px;"),
             put_scope(f"{self.instance_id}_files").style("margin-left: 8px;")
         ]).style('font-size: 14px; padding: 8px 12px')
+        self.load_dir(self.root_path)
+
+    def is_dir(self, path: str) -> bool:
+        """Whether the path is a folder, answered from the metadata of the listing if the path is in it"""
+        row = self.row_index.get(path)
+        if row is not None:
+            return row["is_dir"]
+        location = split_archive_path(path) if self.browse_archives else None
+        if location:
+            try:
+                return get_archive_index(location[0]).is_dir(location[1])
+            except ARCHIVE_ERRORS:
+                return False
+        return os.path.isdir(path)
+
+    def file_exists(self, path: str) -> bool:
+        if os.path.isfile(path):
+            return True
+        location = split_archive_path(path) if self.browse_archives else None
+        try:
+            return bool(location) and get_archive_index(location[0]).is_file(location[1])
+        except ARCHIVE_ERRORS:
+            return False
 
     def on_select(self, files: typing.Union[typing.List[str], str]):
         if not isinstance(files, list):  # single select
             files = [files]
+        preview = files[0] if self.preview and len(files) == 1 and not self.is_dir(files[0]) else None
         with use_scope(f"{self.instance_id}-action_btn", clear=True):
             if len(files) == 1:
                 f = pathlib.Path(files[0])
                 put_button(
-                    f"Open Folder ({f.name})" if f.is_dir() else f"Select File ({f.name})",
+                    f"Open Folder ({f.name})" if self.is_dir(files[0]) else f"Select File ({f.name})",
                     onclick=lambda: self.change_dir_or_add_file(str(f)),
                     color='secondary', small=True,
                 )
             elif len(files) > 1:
-                files = [pathlib.Path(f) for f in files if pathlib.Path(f).is_file()]
+                files = [pathlib.Path(f) for f in files if not self.is_dir(f)]
                 if files:
                     put_button(
                         f"Select {len(files)} Files",
                         onclick=lambda: self.add_files(files),
                         color='secondary', small=True,
                     )
+        if self.preview:
+            self.show_preview(preview)
+
+    def show_preview(self, path: typing.Optional[str]):
+        """Show the thumbnail of the file in the preview pane.
+        The thumbnail is generated in the worker thread, and is shown when it's ready without blocking the caller."""
+        self.preview_seq += 1
+        seq = self.preview_seq
+        scope = f"{self.instance_id}_preview"
+        if path is None or ThumbnailCache.kind(path) is None:
+            clear(scope)
+            return
+
+        with use_scope(scope, clear=True):
+            put_loading(shape='border', color='secondary').style('width: 1rem; height: 1rem;')
+        future = _thumbnail_executor.submit(thumbnail_cache.get, path)
+        thread = threading.Thread(target=self.wait_preview, args=(future, seq), daemon=True)
+        register_thread(thread)
+        thread.start()
+
+    def wait_preview(self, future, seq: int):
+        session = get_current_session()
+        thumbnail = None
+        deadline = time.monotonic() + 60
+        while seq == self.preview_seq and not session.closed() and time.monotonic() < deadline:
+            try:
+                thumbnail = future.result(timeout=1)
+                break
+            except TimeoutError:
+                continue
+        if seq != self.preview_seq or session.closed():  # another file is selected
+            return
+        with use_scope(f"{self.instance_id}_preview", clear=True):
+            if thumbnail:
+                put_image(thumbnail, format='jpeg').style('max-width: 100%; max-height: 256px; border-radius: 4px;')
+
+    # show a summary instead of the file list when more files than this are selected
+    collapse_threshold = 100
 
     def show_files(self):
+        """Render all the selected files"""
+        self.collapsed = len(self.selected_files) > self.collapse_threshold
         with use_scope(f"{self.instance_id}_files", clear=True):
-            for file in self.selected_files:
-                put_text(file).onclick(lambda file=file: [
-                    self.selected_files.remove(file) if file in self.selected_files else None,
-                    self.show_files()
-                ]).style('margin-bottom: 0px;')
+            if not self.collapsed:
+                for file in self.selected_files:
+                    self.put_file(file)
+                return
+
+            files = list(itertools.islice(self.selected_files, 3))
+            put_text(f"{len(self.selected_files)} files selected: {', '.join(files)}, ...", inline=True)
+            put_button("Clear", onclick=self.clear_files, color='secondary', small=True, outline=True) \
+                .style('margin-left: 8px;')
+
+    def put_file(self, file: str):
+        put_scope(self.selected_files[file], [
+            put_text(file).onclick(lambda: self.remove_file(file)).style('margin-bottom: 0px;')
+        ], scope=f"{self.instance_id}_files")
+
+    def remove_file(self, file: str):
+        scope = self.selected_files.pop(file, None)
+        if scope is None:
+            return
+        if self.collapsed:
+            self.show_files()
+        else:
+            remove(scope)
+
+    def clear_files(self):
+        self.selected_files.clear()
+        self.show_files()
 
     def show_path(self, path: pathlib.Path):
         parts = path.relative_to(self.root_path).parts
@@ -99,50 +851,291 @@ class FilePicker:
                 curr_path = str(self.root_path / pathlib.Path(*parts[:i + 1]))
                 put_text(part, inline=True).onclick(lambda path=curr_path: self.change_dir_or_add_file(path))
 
-    def path_info(self, path: pathlib.Path):
-        files = []
-        for f in path.iterdir():
-            if not self.show_hidden_files and f.name.startswith('.'):
-                continue
-            if f.is_dir() or f.name.lower().endswith(self.accept):
-                file = {
-                    "id": str(f),
-                    "name": f"{f.name}" if f.is_file() else f"📁 {f.name}/",
-                }
-                try:
-                    file.update({
-                        "size": self.readable_size(f.stat().st_size) if f.is_file() else '--',
-                        "date_modified": datetime.fromtimestamp(f.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-                    })
-                except Exception:
-                    pass
-                files.append(file)
-
-        files.sort(key=lambda f: (f["name"][0] != "📁", f["name"].lower()))
+    def path_info(self, path: pathlib.Path, files: typing.List[dict] = None, cancel: threading.Event = None):
+        location = split_archive_path(path) if self.browse_archives else None
+        if location:
+            return self.with_parent_row(path, scan_archive(*location, self.accept, self.show_hidden_files))
+
+        files = list(listing_cache.get(path, self.listing_accept, self.show_hidden_files, files, cancel))
+        return self.with_parent_row(path, self.mark_archives(files))
+
+    def mark_archives(self, files: typing.List[dict]) -> typing.List[dict]:
+        """Show the archives as folders in the listing, unless the archive itself is acceptable"""
+        if not self.browse_archives:
+            return files
+        archives = []
+        for i, f in enumerate(files):
+            name = f["name"].lower()
+            if not f["is_dir"] and name.endswith(ARCHIVE_SUFFIXES):
+                if not (self.accept and name.endswith(self.accept)):
+                    archives.append(i)
+        for i in archives:
+            files[i] = dict(files[i], name=f"📦 {files[i]['name']}/", is_dir=True)
+            files[i].pop("mtime", None)  # not a real folder, don't compute the folder size
+        return sort_rows(files) if archives else files
+
+    def with_parent_row(self, path: pathlib.Path, files: typing.List[dict]):
         if path != self.root_path:
-            files.insert(0, {"name": "📁 ../", "size": '--', "id": str(path.parent.resolve()), "date_modified": '--'})
+            files.insert(0, {"name": "📁 ../", "size": '--', "id": str(path.parent), "date_modified": '--',
+                             "is_dir": True})
         return files
 
+    def init_datasource(self):
+        """Set the datasource of the datatable in lazy mode, the rows are requested via `serve_rows()`"""
+        callback_id = output_register_callback(self.serve_rows)
+        run_js("""window[promise_name].then(grid => {
+            let pending = {}, request_id = 0;
+            window[resolver_name] = function (req, rows, last_row) {
+                let params = pending[req];
+                delete pending[req];
+                if (params) params.successCallback(rows.map(row => grid.flatten_row(row)), last_row);
+            };
+            grid.api.setDatasource({
+                getRows: function (params) {
+                    pending[++request_id] = params;
+                    WebIO.pushData({
+                        req: request_id, start: params.startRow, end: params.endRow,
+                        sort: params.sortModel, filter: params.filterModel
+                    }, callback_id);
+                }
+            });
+        })""", promise_name=f"ag_grid_{self.instance_id}_promise", resolver_name=f"{self.instance_id}_resolve_rows",
+               callback_id=callback_id)
+
+    def set_rows(self, rows: typing.List[dict]):
+        self.rows = rows
+        self.view_cache = {}
+
+    @staticmethod
+    def _match_filter(value: str, condition: dict) -> bool:
+        if 'operator' in condition:  # combined conditions
+            matches = [FilePicker._match_filter(value, condition[c]) for c in ('condition1', 'condition2')]
+            return all(matches) if condition['operator'] == 'AND' else any(matches)
+        value, expected = str(value).lower(), str(condition.get('filter') or '').lower()
+        return {
+            'contains': lambda: expected in value,
+            'notContains': lambda: expected not in value,
+            'equals': lambda: value == expected,
+            'notEqual': lambda: value != expected,
+            'startsWith': lambda: value.startswith(expected),
+            'endsWith': lambda: value.endswith(expected),
+            'blank': lambda: not value,
+            'notBlank': lambda: bool(value),
+        }.get(condition.get('type'), lambda: True)()
+
+    def view_rows(self, sort_model: typing.List[dict], filter_model: typing.Dict[str, dict]) -> typing.List[dict]:
+        """Get the rows sorted and filtered by the datatable's sort model and filter model"""
+        key = (tuple((s['colId'], s['sort']) for s in sort_model),
+               tuple(sorted((k, repr(v)) for k, v in filter_model.items())))
+        if key not in self.view_cache:
+            rows = [
+                row for row in self.rows
+                if all(self._match_filter(row.get(field, ''), cond) for field, cond in filter_model.items())
+            ]
+            # stable sort from the last sort key to the first, keep folders before files
+            for col, order in reversed(key[0]):
+                rows.sort(key=self.sort_keys.get(col, lambda row, col=col: str(row.get(col, '')).lower()),
+                          reverse=order == 'desc')
+            if key[0]:
+                rows.sort(key=lambda row: (row['name'] != "📁 ../", not row['is_dir']))
+            self.view_cache[key] = rows
+        return self.view_cache[key]
+
+    def serve_rows(self, request: dict):
+        """Send the requested page of rows to the datatable in lazy mode"""
+        rows = self.view_rows(request.get('sort') or [], request.get('filter') or {})
+        run_js("window[resolver_name] && window[resolver_name](req, rows, last_row)",
+               resolver_name=f"{self.instance_id}_resolve_rows", req=request['req'],
+               rows=self.columns_only(rows[request['start']:request['end']]), last_row=len(rows))
+
+    def columns_only(self, rows: typing.List[dict]) -> typing.List[dict]:
+        """Strip the metadata of the rows before sending them to the datatable"""
+        return [{col: row[col] for col in self.columns if col in row} for row in rows]
+
+    def update_rows(self, rows: typing.List[dict]):
+        self.row_index = {row["id"]: row for row in rows}
+        if self.lazy:
+            self.set_rows(rows)
+            run_js("window[promise_name].then(grid => grid.api.purgeInfiniteCache())",
+                   promise_name=f"ag_grid_{self.instance_id}_promise")
+        else:
+            datatable_update(self.instance_id, self.columns_only(rows))
+
     def change_dir_or_add_file(self, path: str):
+        is_dir = self.is_dir(path)
         path = pathlib.Path(path)
-        if path.is_dir():
+        if is_dir:
             if not path.is_relative_to(self.root_path):
                 toast("No permission to access the path", color="error")
                 return
+            if self.searching:  # leave the search results
+                pin[f"{self.instance_id}_search"] = ''
             self.show_path(path)
-            datatable_update(self.instance_id, self.path_info(path))
+            self.load_dir(path)
             self.on_select([])
         else:
             self.add_files([path])
 
+    def load_dir(self, path: pathlib.Path):
+        """List the directory in the worker thread and show it in the datatable.
+
+        If the listing isn't finished in `listing_timeout` seconds, show the partial listing, and show the full
+        listing when it's finished. The listing is dropped if the user has navigated to another directory.
+        """
+        generation, cancel = self.navigate()
+        self.current_path = path
+        self.searching = False
+
+        partial = []
+        future = _scan_executor.submit(self.path_info, path, partial, cancel)
+        with use_scope(f"{self.instance_id}_loading", clear=True):
+            put_loading(shape='border', color='secondary').style('width: 1rem; height: 1rem; vertical-align: middle;')
+
+        try:
+            self.show_listing(future.result(timeout=self.listing_timeout), generation)
+        except TimeoutError:
+            self.update_rows(self.with_parent_row(path, self.mark_archives(sort_rows(list(partial)))))
+            toast("The folder is large or the disk is slow, showing partial results", color='warn')
+            thread = threading.Thread(target=self.wait_listing, args=(future, generation), daemon=True)
+            register_thread(thread)
+            thread.start()
+        except ARCHIVE_ERRORS as e:  # archive errors are raised when browsing archives
+            self.show_listing([], generation)
+            toast(f"Can't list the folder: {e}", color="error")
+
+    def navigate(self) -> typing.Tuple[int, threading.Event]:
+        """Start a new navigation, stop the pending listing of the previous one"""
+        self.cancel_listing.set()
+        self.cancel_listing = threading.Event()
+        self.generation += 1
+        return self.generation, self.cancel_listing
+
+    def search_files(self, query: str):
+        """Show the files whose name contains ``query`` in the root folder tree"""
+        query = (query or '').strip()
+        if not query:
+            # the search box is also cleared when leaving the search results, the folder is loaded already then
+            if self.searching:
+                self.load_dir(self.current_path)
+            return
+
+        generation, _ = self.navigate()
+        self.searching = True
+        index = get_search_index(self.root_path, self.show_hidden_files)
+        index.refresh_async()
+        session = get_current_session()
+        if not index.ready:
+            with use_scope(f"{self.instance_id}_loading", clear=True):
+                put_loading(shape='border', color='secondary').style('width: 1rem; height: 1rem; vertical-align: middle;')
+                put_text("Indexing files...", inline=True).style('margin-left: 4px;')
+            while not index.ready and generation == self.generation and not session.closed():
+                time.sleep(0.2)
+
+        rows = []
+        for path, is_dir in index.search(query, self.accept):
+            name = os.path.relpath(path, index.root)
+            row = {"id": path, "name": f"📁 {name}/" if is_dir else name, "is_dir": is_dir}
+            try:
+                stat = os.stat(path)
+                row.update({
+                    "bytes": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "size": '--' if is_dir else self.readable_size(stat.st_size),
+                    "date_modified": _format_timestamp(int(stat.st_mtime)),
+                })
+            except OSError:
+                continue  # removed after indexed
+            rows.append(row)
+        self.show_listing(rows, generation)
+        if generation == self.generation and index.truncated:
+            toast(f"Only the first {index.max_entries} files are searched", color='warn')
+
+    def wait_listing(self, future, generation: int):
+        session = get_current_session()
+        while generation == self.generation and not session.closed():
+            try:
+                rows = future.result(timeout=1)
+            except TimeoutError:
+                continue
+            except ARCHIVE_ERRORS as e:
+                self.show_listing([], generation)
+                toast(f"Can't list the folder: {e}", color="error")
+                return
+            self.show_listing(rows, generation)
+            return
+
+    def show_listing(self, rows: typing.List[dict], generation: int):
+        if generation != self.generation:  # stale listing
+            return
+        pending = []
+        if self.folder_size:
+            # the rows are shared by the listing cache, copy the folder rows before filling the size
+            rows = [dict(row) if row["is_dir"] and "mtime" in row else row for row in rows]
+            pending = [row for row in rows if row["is_dir"] and "mtime" in row]
+        self.update_rows(rows)
+        clear(f"{self.instance_id}_loading")
+        if self.prefetch and not self.searching:
+            folders = [row["id"] for row in rows if row["is_dir"] and "mtime" in row][:self.prefetch]
+            _prefetch_executor.submit(self.prefetch_listings, folders, self.cancel_listing)
+        if pending:
+            thread = threading.Thread(target=self.compute_folder_sizes, args=(pending, generation), daemon=True)
+            register_thread(thread)
+            thread.start()
+
+    def prefetch_listings(self, folders: typing.List[str], cancel: threading.Event):
+        """List the sub folders into `listing_cache` in background, so the next navigation is served from memory.
+        Stop when the user navigates to another folder."""
+        for folder in folders:
+            if cancel.is_set():
+                return
+            try:
+                listing_cache.get(folder, self.listing_accept, self.show_hidden_files, cancel=cancel)
+            except OSError:
+                pass
+
+    def compute_folder_sizes(self, rows: typing.List[dict], generation: int):
+        """Compute the sizes of the folders in background, and update the size cells as they finish"""
+        cancel = self.cancel_listing
+        futures = {_size_executor.submit(folder_size_cache.compute, row["id"], cancel): row for row in rows}
+        session = get_current_session()
+        while futures and generation == self.generation and not session.closed():
+            wait(futures, timeout=1, return_when=FIRST_COMPLETED)
+            time.sleep(0.2)  # send the updates in batch
+            updates = []
+            for future in [f for f in futures if f.done()]:
+                row = futures.pop(future)
+                size = future.result()
+                if size is not None:
+                    row.update(size=self.readable_size(size), bytes=size)
+                    updates.append([row["id"], row["size"]])
+            if updates and generation == self.generation:
+                run_js("""window[promise_name].then(grid => updates.forEach(([row_id, size]) => {
+                    let row = grid.api.getRowNode(row_id);
+                    if (row) row.setDataValue('size', size);
+                }))""", promise_name=f"ag_grid_{self.instance_id}_promise", updates=updates)
+
+    def close(self):
+        """Stop the pending listing"""
+        self.generation += 1
+        self.cancel_listing.set()
+
     def add_files(self, paths: typing.List[pathlib.Path]):
+        added = []
         for path in paths:
             file = str(path.relative_to(self.root_path))
             if file not in self.selected_files:
                 if not self.multiple:
                     self.selected_files.clear()
-                self.selected_files.append(file)
-        self.show_files()
+                    added.clear()
+                self.selected_files[file] = f"{self.instance_id}_file_{random_str(10)}"
+                added.append(file)
+
+        # only render the newly added files
+        if not self.multiple or self.collapsed or len(self.selected_files) > self.collapse_threshold:
+            self.show_files()
+        else:
+            for file in added:
+                self.put_file(file)
 
         # unselect the datatable row
         run_js("window[instance_id].then(grid => grid.api.deselectAll())",
@@ -157,6 +1150,12 @@ def file_picker(
         cancelable: bool = False,
         title: str = 'File Picker',
         show_hidden_files: bool = False,
+        lazy: bool = False,
+        search: bool = False,
+        folder_size: bool = False,
+        browse_archives: bool = False,
+        prefetch: int = 0,
+        preview: bool = False,
 ) -> typing.Union[str, typing.List[str], None]:
     """
     A file picker widget that allows you to select files from the local file system where PyWebIO is running.
@@ -169,6 +1168,27 @@ def file_picker(
        By default, the user can only close the file picker by selecting the file.
     :param str title: The title of the file picker popup.
     :param show_hidden_files: Whether to show hidden files/folders.
+    :param bool lazy: Whether to load the directory listing lazily. In lazy mode, the listing is kept in server
+       side, and only the rows in the visible window of the datatable are sent to the browser, the sorting and
+       filtering are also done in server side. Useful for the directories with a huge number of files.
+    :param bool folder_size: Whether to show the folder sizes. The sizes are computed in background and are cached
+       on disk (see ``from pywebio_battery.file_picker import folder_size_cache``), so the later visits only need
+       to check the modification time of the sub folders.
+    :param bool browse_archives: Whether to browse the zip/tar archives as folders. The members are listed from
+       the index of the archive without extracting it. The path of the selected member is in the form of
+       ``/path/to/archive.zip/member``, use `open_file()` to read it.
+       Note that a compressed tar archive (e.g. ``.tar.gz``) is decompressed entirely once to list its members.
+    :param int prefetch: The max number of sub folders to list in background after a folder is shown,
+       so that opening them is served from memory. ``0`` means no prefetching.
+       The prefetching is stopped when the user navigates to another folder.
+    :param bool preview: Whether to show the thumbnail of the selected image/video file. The thumbnails are
+       generated on demand and are cached on disk (see ``from pywebio_battery.file_picker import thumbnail_cache``).
+       Requires `Pillow <https://pypi.org/project/Pillow/>`_ for images and `ffmpeg <https://ffmpeg.org/>`_
+       for videos.
+    :param bool search: Whether to show the search box, which searches the file names in all sub folders of
+       ``path``. The file names are indexed in background on the first search, and the index is shared by the
+       file pickers with the same ``path``. Not enabled by default, since indexing a large folder tree
+       (e.g. the default ``path='/'``) costs much time and memory.
     :return: The selected file path or a list of file paths.
         ``None`` if the user cancels the file picker.
 
@@ -178,6 +1198,12 @@ def file_picker(
 
         files = file_picker('.', multiple=True, accept='py')
         put_text(files)
+
+    The directory listings are cached and shared by all file pickers in the process,
+    see ``from pywebio_battery.file_picker import listing_cache`` for the cache settings and hit/miss counters.
+
+    .. versionchanged:: 0.8
+       add ``lazy``, ``search``, ``folder_size``, ``browse_archives``, ``prefetch`` and ``preview`` parameters
     """
     no_animation = eval_js("document.body.classList.contains('no-animation')")
     if not no_animation:
@@ -185,7 +1211,9 @@ def file_picker(
         set_env(output_animation=False)
 
     with popup(title, size='large', closable=False):
-        picker = FilePicker(path, multiple, accept, show_hidden_files)
+        picker = FilePicker(path, multiple, accept, show_hidden_files, lazy=lazy, search=search,
+                             folder_size=folder_size, browse_archives=browse_archives, prefetch=prefetch,
+                             preview=preview)
         buttons = [{'label': 'CONFIRM', 'value': True}]
         if cancelable:
             buttons.append({'label': 'CANCEL', 'value': False, 'color': 'warning'})
@@ -195,10 +1223,19 @@ def file_picker(
         submit = pin_wait_change(f"picker-{picker.instance_id}")
         if not cancelable and not picker.selected_files:
             toast("Please select a file", color='warn')
-        else:
-            break
+            continue
+        if submit['value']:
+            # the selection is made from the listing, check the files still exist on confirm
+            missing = [f for f in picker.selected_files if not picker.file_exists(os.path.join(picker.root_path, f))]
+            if missing:
+                for f in missing:
+                    picker.remove_file(f)
+                toast(f"{len(missing)} of the selected files no longer exist", color='warn')
+                continue
+        break
 
     close_popup()
+    picker.close()
 
     if not no_animation:
         set_env(output_animation=True)
@@ -207,7 +1244,7 @@ def file_picker(
         return None
 
     selected_files = [
-        os.path.join(picker.root_path, f)
+        os.path.join(picker.path, f)
         for f in picker.selected_files
     ]
 
@@ -1,19 +1,37 @@
+import asyncio
 import base64
+import codecs
+import heapq
 import html
 import io
+import itertools
+import json
+import os
+import selectors
+import signal
 import subprocess
+import threading
+import time
 from functools import partial
-from typing import Union, Optional, Sequence, Mapping, Tuple, Callable, Dict
+from typing import Union, Optional, Sequence, Mapping, Tuple, Callable, Dict, BinaryIO
 
 from pywebio.output import *
 from pywebio.output import Output
 from pywebio.output import OutputPosition
 from pywebio.pin import *
 from pywebio.session import *
+from pywebio.session import get_current_session
+from pywebio.session.coroutinebased import CoroutineBasedSession
 from pywebio.utils import random_str
 
-__all__ = ['confirm', 'popup_input', 'redirect_stdout', 'run_shell', 'put_logbox', 'logbox_append', 'logbox_clear', 
-           'put_video', 'put_audio', 'wait_scroll_to_bottom']
+from .media import _media_url, _blob_src
+from .utils import SessionContext
+
+__all__ = ['confirm', 'popup_input', 'redirect_stdout', 'run_shell', 'run_shell_async',
+           'set_shell_concurrency', 'get_shell_queue_stats', 'put_logbox', 'logbox_append', 'logbox_clear', 'logbox_flush',
+           'put_video', 'put_video_stream', 'video_stream_append', 'video_stream_append_async',
+           'video_stream_end', 'put_audio',
+           'wait_scroll_to_bottom']
 
 
 def confirm(
@@ -158,18 +176,250 @@ def redirect_stdout(output_func=partial(put_text, inline=True)):
     return redirect_stdout(WebIO())
 
 
-def run_shell(cmd: str, output_func=partial(put_text, inline=True), encoding='utf8') -> int:
+class _ShellJob:
+    __slots__ = ('priority', 'sort_key', 'granted', 'notify', 'enqueue_time')
+
+    def __init__(self, priority, sort_key, notify):
+        self.priority = priority
+        self.sort_key = sort_key
+        self.granted = False
+        self.notify = notify
+        self.enqueue_time = time.monotonic()
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+
+class _ShellJobQueue:
+    """Process-wide limiter of the concurrent shell commands started by `run_shell()` and `run_shell_async()`"""
+
+    position_report_interval = 1  # seconds
+
+    def __init__(self):
+        self.max_concurrency = None
+        self.policy = 'fifo'
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = []  # heap of _ShellJob
+        self.seq = itertools.count()
+        self.started_jobs = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def set_limit(self, max_concurrency: Optional[int], policy: str):
+        assert policy in ('fifo', 'priority'), "`policy` must be 'fifo' or 'priority'"
+        with self.lock:
+            self.max_concurrency = max_concurrency
+            if policy != self.policy:
+                self.policy = policy
+                for job in self.waiting:
+                    job.sort_key = (job.priority if policy == 'priority' else 0, job.sort_key[1])
+                heapq.heapify(self.waiting)
+            self._grant()
+
+    def _grant(self):
+        """Start the waiting jobs as long as there are free slots. Must be called with lock held"""
+        while self.waiting and (self.max_concurrency is None or self.running < self.max_concurrency):
+            job = heapq.heappop(self.waiting)
+            self._start(job)
+            job.notify()
+
+    def _start(self, job: _ShellJob):
+        wait_time = time.monotonic() - job.enqueue_time
+        job.granted = True
+        self.running += 1
+        self.started_jobs += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def _enqueue(self, priority: int, notify) -> _ShellJob:
+        with self.lock:
+            job = _ShellJob(priority, (priority if self.policy == 'priority' else 0, next(self.seq)), notify)
+            if not self.waiting and (self.max_concurrency is None or self.running < self.max_concurrency):
+                self._start(job)
+            else:
+                heapq.heappush(self.waiting, job)
+            return job
+
+    def position(self, job: _ShellJob) -> int:
+        """The 1-based position of the job in the queue, 0 for started job"""
+        with self.lock:
+            if job.granted:
+                return 0
+            return 1 + sum(1 for j in self.waiting if j.sort_key < job.sort_key)
+
+    def release(self, job: _ShellJob):
+        """Release the slot of a started job or remove a waiting job from queue"""
+        with self.lock:
+            if job.granted:
+                self.running -= 1
+                self._grant()
+            elif job in self.waiting:
+                self.waiting.remove(job)
+                heapq.heapify(self.waiting)
+
+    def acquire(self, priority: int, report) -> _ShellJob:
+        """Wait until the job can be started, for thread-based session.
+        ``report(position)`` is called when the position of the job in the queue changes."""
+        event = threading.Event()
+        job = self._enqueue(priority, event.set)
+        last_position = None
+        try:
+            while not job.granted:
+                position = self.position(job)
+                if position and position != last_position:
+                    report(position)
+                    last_position = position
+                event.wait(self.position_report_interval)
+        except BaseException:
+            self.release(job)
+            raise
+        return job
+
+    async def acquire_async(self, priority: int, report) -> _ShellJob:
+        """Coroutine version of `acquire()`, for coroutine-based session"""
+        loop = asyncio.get_event_loop()
+        waiter = None
+
+        def wakeup():
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+        job = self._enqueue(priority, lambda: loop.call_soon_threadsafe(wakeup))
+        last_position = None
+        try:
+            while not job.granted:
+                position = self.position(job)
+                if position and position != last_position:
+                    report(position)
+                    last_position = position
+                waiter = loop.create_future()
+                timer = loop.call_later(self.position_report_interval, wakeup)
+                await waiter
+                timer.cancel()
+        except BaseException:
+            self.release(job)
+            raise
+        return job
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return dict(
+                max_concurrency=self.max_concurrency,
+                policy=self.policy,
+                running=self.running,
+                queued=len(self.waiting),
+                started_jobs=self.started_jobs,
+                avg_wait_time=self.total_wait_time / self.started_jobs if self.started_jobs else 0.0,
+                max_wait_time=self.max_wait_time,
+                longest_waiting_time=time.monotonic() - min(j.enqueue_time for j in self.waiting)
+                if self.waiting else 0.0,
+            )
+
+
+_shell_queue = _ShellJobQueue()
+
+
+def set_shell_concurrency(max_concurrency: Optional[int], policy: str = 'fifo'):
+    """Limit the number of shell commands run concurrently by `run_shell()` and `run_shell_async()`
+    in the whole process.
+
+    When the limit is reached, the newly started commands wait in a queue, and their position in the queue is
+    shown via the ``output_func`` of `run_shell()`. The limit works across all the sessions,
+    both thread-based and coroutine-based.
+
+    :param int max_concurrency: The maximum number of concurrent shell commands. ``None`` means no limit,
+        which is the default.
+    :param str policy: The order of the waiting commands. ``'fifo'`` (default) means first come first served,
+        ``'priority'`` means the command with smaller ``priority`` value in `run_shell()` runs first,
+        and the commands with the same priority are first come first served.
+
+    .. versionadded:: 0.8
+    """
+    _shell_queue.set_limit(max_concurrency, policy)
+
+
+def get_shell_queue_stats() -> Dict:
+    """Get the metrics of the shell command queue, see `set_shell_concurrency()`.
+
+    :return: A dict with the following keys:
+
+        * ``max_concurrency``: the current concurrency limit
+        * ``policy``: the current queue policy
+        * ``running``: number of the running commands
+        * ``queued``: number of the commands waiting in the queue
+        * ``started_jobs``: number of the commands that have been started
+        * ``avg_wait_time``, ``max_wait_time``: average/max time (in seconds) the started commands waited in the queue
+        * ``longest_waiting_time``: how long (in seconds) the first queued command has been waiting
+
+    .. versionadded:: 0.8
+    """
+    return _shell_queue.stats()
+
+
+def _queue_reporter(output_func):
+    return lambda position: output_func('[Waiting for other commands to finish, position in queue: %s]\n' % position)
+
+
+def _stream_output(stream, output_func, encoding: str, flush_interval: float, flush_size: int):
+    """Read raw chunks from the stream and output them in batches.
+
+    The buffered output is flushed when its size reaches ``flush_size`` characters or
+    it has been buffered for ``flush_interval`` seconds.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')  # never split multibyte characters
+    fd = stream.fileno()
+    buffer, size, deadline = [], 0, None
+    selector = selectors.DefaultSelector() if os.name == 'posix' else None  # select() on pipes is POSIX only
+    if selector:
+        selector.register(fd, selectors.EVENT_READ)
+    try:
+        while True:
+            if selector is None or selector.select(None if deadline is None else max(0, deadline - time.monotonic())):
+                data = os.read(fd, 2 ** 16)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    buffer.append(text)
+                    size += len(text)
+                    if deadline is None:
+                        deadline = time.monotonic() + flush_interval
+                if not data:
+                    break
+            if buffer and (size >= flush_size or selector is None or time.monotonic() >= deadline):
+                output_func(''.join(buffer))
+                buffer, size, deadline = [], 0, None
+    finally:
+        if selector:
+            selector.close()
+    if buffer:
+        output_func(''.join(buffer))
+
+
+def run_shell(cmd: str, output_func=partial(put_text, inline=True), encoding='utf8',
+              flush_interval: float = None, flush_size: int = 4096, priority: int = 0) -> int:
     """Run command in shell and output the result to pywebio
 
     :param str cmd: command to run
     :param callable output_func: output function, default to `put_text()`.
         the function should accept one argument, the output text of command.
     :param str encoding: command output encoding
+    :param float flush_interval: Enable the streaming mode. In streaming mode, the command output is read in raw
+        chunks instead of lines, so the output without newline (like progress bar) can also be shown in time,
+        and the output is passed to ``output_func`` in batches: the batch is flushed when it has been buffered for
+        ``flush_interval`` seconds or its size reaches ``flush_size`` characters.
+        Default is ``None``, which means ``output_func`` is called once per line of the command output.
+    :param int flush_size: The max size of the output batch in streaming mode.
+    :param int priority: The priority of the command in the process-wide command queue,
+        smaller value means higher priority. Only take effect when the ``'priority'`` policy is used in
+        `set_shell_concurrency()`.
     :return: shell command return code
 
     .. versionchanged:: 0.4
        add ``encoding`` parameter and return code
 
+    .. versionchanged:: 0.8
+       add ``flush_interval``, ``flush_size`` and ``priority`` parameters
+
     .. exportable-codeblock::
         :name: battery-run-shell
         :summary: Run shell and output to code block
@@ -178,22 +428,264 @@ def run_shell(cmd: str, output_func=partial(put_text, inline=True), encoding='ut
         put_logbox('shell_output')
         run_shell(cmd, output_func=lambda msg: logbox_append('shell_output', msg))
     """
-    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    job = _shell_queue.acquire(priority, _queue_reporter(output_func))
     try:
-        while True:
-            out = process.stdout.readline()
-            if out:
-                output_func(out.decode(encoding))
-
-            if not out and process.poll() is not None:
-                break
+        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            if flush_interval is not None:
+                _stream_output(process.stdout, output_func, encoding, flush_interval, flush_size)
+                process.wait()
+            while flush_interval is None:
+                out = process.stdout.readline()
+                if out:
+                    output_func(out.decode(encoding))
+
+                if not out and process.poll() is not None:
+                    break
+        finally:
+            process.kill()
+            process.stdout.close()
     finally:
-        process.kill()
-        process.stdout.close()
+        _shell_queue.release(job)
     return process.poll()
 
 
-def put_logbox(name: str, height=400, keep_bottom=True) -> Output:
+def _kill_process_group(process):
+    """Kill the process and all its children, the process must be started with ``start_new_session=True``"""
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def run_shell_async(cmd: str, output_func=partial(put_text, inline=True), encoding='utf8',
+                          stderr_func=None, timeout: float = None, priority: int = 0) -> int:
+    """Run command in shell and output the result to pywebio, the asyncio version of `run_shell()`
+
+    Reading the command output won't block the event loop, so it's suitable for
+    :ref:`coroutine-based session <coroutine_based_session>`.
+    The command runs in a new process group, which is killed when the timeout expires,
+    the coroutine is cancelled or the session is closed.
+
+    :param str cmd: command to run
+    :param callable output_func: output function, default to `put_text()`.
+        the function should accept one argument, the output text of command.
+    :param str encoding: command output encoding
+    :param callable stderr_func: output function for the stderr of the command.
+        Default is ``None``, which means the stderr is merged into stdout and output with ``output_func``.
+    :param float timeout: Seconds for the command to run.
+        When the timeout expires, the command is killed and the negative signal number is returned.
+        The time waiting in the command queue (see `set_shell_concurrency()`) is not counted.
+    :param int priority: The priority of the command in the process-wide command queue, see `run_shell()`.
+    :return: shell command return code
+
+    .. exportable-codeblock::
+        :name: battery-run-shell-async
+        :summary: Run shell in coroutine-based session
+
+        async def main():
+            put_logbox('shell_output')
+            await run_shell_async("ls -l", output_func=lambda msg: logbox_append('shell_output', msg))
+
+    .. versionadded:: 0.8
+    """
+    loop = asyncio.get_event_loop()
+    job = await _shell_queue.acquire_async(priority, _queue_reporter(output_func))
+    try:
+        process = await asyncio.create_subprocess_shell(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE if stderr_func else subprocess.STDOUT,
+            start_new_session=True
+        )
+        # The reader tasks run outside the pywebio session context,
+        # so they pass the output to current coroutine to call the output functions.
+        output_queue = asyncio.Queue()
+
+        async def read_stream(stream, func):
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')  # the long line is read in parts
+            try:
+                while True:
+                    try:
+                        line = await stream.readuntil(b'\n')
+                    except asyncio.IncompleteReadError as e:  # the last line without newline
+                        line = e.partial
+                    except asyncio.LimitOverrunError as e:  # line too long, read the part in buffer
+                        line = await stream.readexactly(e.consumed)
+                    text = decoder.decode(line, final=not line)
+                    if text:
+                        output_queue.put_nowait((func, text))
+                    if not line:
+                        break
+            finally:
+                output_queue.put_nowait(None)
+
+        readers = [loop.create_task(read_stream(process.stdout, output_func))]
+        if stderr_func:
+            readers.append(loop.create_task(read_stream(process.stderr, stderr_func)))
+        timer = loop.call_later(timeout, _kill_process_group, process) if timeout else None
+        try:
+            running = len(readers)
+            while running:
+                item = await output_queue.get()
+                if item is None:
+                    running -= 1
+                    continue
+                func, text = item
+                func(text)
+            return await process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            for reader in readers:
+                reader.cancel()
+            if process.returncode is None:
+                _kill_process_group(process)
+    finally:
+        _shell_queue.release(job)
+
+
+def _init_logbox_client():
+    session = get_current_session()
+    if 'logbox_client_flag' not in session.internal_save:
+        session.internal_save['logbox_client_flag'] = True
+        run_js("""
+        window.WebIOLogbox = {
+            count_lines: function(text) {
+                let cnt = 0, idx = -1;
+                while ((idx = text.indexOf('\\n', idx + 1)) !== -1) cnt++;
+                return cnt;
+            },
+            append: function(dom_id, text, max_lines, max_chars, reset) {
+                let el = document.getElementById(dom_id);
+                if (!el) return;
+                if (reset) el.textContent = '';
+                if (reset || el._lines === undefined) {
+                    el._lines = this.count_lines(el.textContent);
+                    el._chars = el.textContent.length;
+                }
+                el.appendChild(document.createTextNode(text));
+                el._lines += this.count_lines(text);
+                el._chars += text.length;
+                if ((max_lines && el._lines > max_lines) || (max_chars && el._chars > max_chars))
+                    this.evict(el, max_lines ? el._lines - max_lines : 0, max_chars ? el._chars - max_chars : 0);
+            },
+            // remove the oldest content, at least `drop_lines` lines and `drop_chars` characters
+            evict: function(el, drop_lines, drop_chars) {
+                let node = el.firstChild, last_full = null, removed_lines = 0, removed_chars = 0;
+                while (node && (removed_lines < drop_lines || removed_chars < drop_chars)) {
+                    let text = node.data, cut = 0;
+                    if (removed_lines < drop_lines) {  // find the end of the lines to drop in this node
+                        let idx = -1, need = drop_lines - removed_lines;
+                        while (need > 0 && (idx = text.indexOf('\\n', idx + 1)) !== -1) need--;
+                        cut = need > 0 ? text.length : idx + 1;
+                    }
+                    cut = Math.min(text.length, Math.max(cut, drop_chars - removed_chars));
+                    if (cut < text.length) {
+                        removed_lines += this.count_lines(text.substring(0, cut));
+                        removed_chars += cut;
+                        node.deleteData(0, cut);
+                        break;
+                    }
+                    removed_lines += this.count_lines(text);
+                    removed_chars += text.length;
+                    last_full = node;
+                    node = node.nextSibling;
+                }
+                if (last_full) {  // remove the whole nodes in bulk
+                    let range = document.createRange();
+                    range.setStartBefore(el.firstChild);
+                    range.setEndAfter(last_full);
+                    range.deleteContents();
+                }
+                el._lines -= removed_lines;
+                el._chars -= removed_chars;
+            }
+        };
+        """)
+
+
+def _logbox_tail(text: str, max_lines: int = None, max_chars: int = None) -> Tuple[str, bool]:
+    """Return the tail of the text that a bounded logbox will keep, and whether the text is truncated"""
+    start = 0
+    if max_lines:
+        idx = len(text)
+        for _ in range(max_lines + 1):
+            idx = text.rfind('\n', 0, idx)
+            if idx == -1:
+                break
+        if idx != -1:
+            start = idx + 1
+    if max_chars and len(text) - start > max_chars:
+        start = len(text) - max_chars
+    return text[start:], start > 0
+
+
+class _Logbox:
+    """Server side state of a logbox which is in buffered mode or has size limit"""
+
+    def __init__(self, name: str, flush_interval: float = None, max_batch_bytes: int = None,
+                 max_lines: int = None, max_chars: int = None):
+        self.dom_id = "webio-logbox-%s" % name
+        self.flush_interval = flush_interval
+        self.max_batch_bytes = max_batch_bytes
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.context = SessionContext()
+        self.chunks = []
+        self.size = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def append(self, text: str):
+        if self.flush_interval is None:
+            self._send(text)
+            return
+        with self.lock:
+            self.chunks.append(text)
+            self.size += len(text.encode('utf8'))
+            if self.size < self.max_batch_bytes:
+                if self.timer is None:
+                    self.timer = self.context.call_later(self.flush_interval, self.flush)
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            text = ''.join(self.chunks)
+            self._reset_buffer()
+            # send message in lock to keep the order of the flushes
+            if text:
+                self._send(text)
+
+    def clear(self):
+        with self.lock:
+            self._reset_buffer()
+
+    def _reset_buffer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.chunks.clear()
+        self.size = 0
+
+    def _send(self, text: str):
+        if not (self.max_lines or self.max_chars):
+            self.context.run_js('$("#%s").append(document.createTextNode(text))' % self.dom_id, text=text)
+            return
+        # don't send the text that would be evicted by the client right away
+        text, truncated = _logbox_tail(text, self.max_lines, self.max_chars)
+        self.context.run_js("WebIOLogbox.append(dom_id, text, max_lines, max_chars, reset)", dom_id=self.dom_id,
+                            text=text, max_lines=self.max_lines, max_chars=self.max_chars, reset=truncated)
+
+
+def _get_logbox(name: str) -> Optional[_Logbox]:
+    return get_current_session().internal_save.get('logboxes', {}).get(name)
+
+
+def put_logbox(name: str, height=400, keep_bottom=True, flush_interval: float = None,
+               max_batch_bytes: int = 64 * 1024, max_lines: int = None, max_chars: int = None) -> Output:
     r"""Output a logbox widget
 
     .. exportable-codeblock::
@@ -215,10 +707,32 @@ def put_logbox(name: str, height=400, keep_bottom=True) -> Output:
     :param int height: the height of the widget in pixel
     :param bool keep_bottom: Whether to scroll to bottom when new content is appended
         (via `logbox_append()`).
+    :param float flush_interval: Enable the buffered mode of the logbox. In buffered mode, the text appended by
+        `logbox_append()` is collected in server side and sent to the browser at most once every ``flush_interval``
+        seconds, which greatly reduces the number of messages when appending lots of small text.
+        Use `logbox_flush()` to send the buffered text immediately. The buffered text is also sent before the
+        session closes. Default is ``None``, which means each `logbox_append()` call sends the text immediately.
+    :param int max_batch_bytes: In buffered mode, the buffered text is sent immediately when its size
+        exceeds ``max_batch_bytes`` bytes.
+    :param int max_lines: The maximum number of lines the logbox keeps. When exceeded, the oldest lines are removed.
+        Default is ``None``, which means no limit.
+    :param int max_chars: The maximum number of characters the logbox keeps. When exceeded, the oldest content is
+        removed. Default is ``None``, which means no limit.
 
     .. versionchanged:: 0.3
        add ``keep_bottom`` parameter
+
+    .. versionchanged:: 0.8
+       add ``flush_interval``, ``max_batch_bytes``, ``max_lines`` and ``max_chars`` parameters
     """
+    logboxes = get_current_session().internal_save.setdefault('logboxes', {})
+    if name in logboxes:
+        logboxes.pop(name).clear()
+    if flush_interval is not None or max_lines or max_chars:
+        if max_lines or max_chars:
+            _init_logbox_client()
+        logboxes[name] = _Logbox(name, flush_interval, max_batch_bytes, max_lines, max_chars)
+
     dom_id = "webio-logbox-%s" % name
     style = 'height:%spx' % height if height else ''
     html = '<pre style="%s" tabindex="0"><code id="%s"></code></pre>' % (style, dom_id)
@@ -239,21 +753,46 @@ def put_logbox(name: str, height=400, keep_bottom=True) -> Output:
 
 def logbox_append(name: str, text: str):
     """Append text to a logbox widget"""
-    run_js('$("#webio-logbox-%s").append(document.createTextNode(text))' % name, text=str(text))
+    logbox = _get_logbox(name)
+    if logbox is not None:
+        logbox.append(str(text))
+    else:
+        run_js('$("#webio-logbox-%s").append(document.createTextNode(text))' % name, text=str(text))
+
+
+def logbox_flush(name: str):
+    """Send the buffered text of a logbox widget to the browser immediately.
+
+    Only take effect when the logbox is in buffered mode (i.e. ``flush_interval`` is set in `put_logbox()`).
+
+    .. versionadded:: 0.8
+    """
+    logbox = _get_logbox(name)
+    if logbox is not None:
+        logbox.flush()
 
 
 def logbox_clear(name: str):
     """Clear all contents of a logbox widget"""
-    run_js('$("#webio-logbox-%s").empty()' % name)
+    logbox = _get_logbox(name)
+    if logbox is not None:
+        logbox.clear()
+    run_js('$("#webio-logbox-%s").empty().prop({_lines: 0, _chars: 0})' % name)
 
 
-def put_video(src: Union[str, bytes], autoplay: bool = False, loop: bool = False,
+def put_video(src: Union[str, bytes, os.PathLike, BinaryIO], autoplay: bool = False, loop: bool = False,
               height: int = None, width: int = None, muted: bool = False, poster: str = None,
               scope: str = None, position: int = OutputPosition.BOTTOM) -> Output:
     """Output video
 
-    :param str/bytes src: Source of video. It can be a string specifying video URL, a bytes-like object specifying
-        the binary content of the video.
+    :param str/bytes/path-like/file-like src: Source of video. It can be a string specifying video URL,
+        a bytes-like object specifying the binary content of the video,
+        a path-like object (e.g. `pathlib.Path`) specifying the local video file,
+        or a seekable binary file-like object.
+        The local file and file-like object are streamed to the browser via a media server which supports HTTP Range
+        requests, so the video can start playing and seeking without the whole content being downloaded.
+        The binary content is cached by its hash, so the same content is only sent to the browser once in a session.
+        See `config_media_server()` for the configuration of the media server and the cache.
     :param bool autoplay: Whether to autoplay the video.
         In some browsers (e.g. Chrome 70.0) autoplay doesn't work if not enable ``muted``.
     :param bool loop: If True, the browser will automatically seek back to the start upon reaching the end of the video.
@@ -276,29 +815,41 @@ def put_video(src: Union[str, bytes], autoplay: bool = False, loop: bool = False
         put_video(url)
 
     .. versionadded:: 0.4
+
+    .. versionchanged:: 0.8
+       support local file and file-like object as ``src``
     """
     kwargs = locals()
+    dom_id = 'webio-media-' + random_str(10)
+    script = ''
     if isinstance(src, (bytes, bytearray)):
-        src = 'data:video/mp4;base64, ' + base64.b64encode(src).decode('ascii')
+        src, script = _blob_src(src, 'video/mp4', dom_id)
+    elif isinstance(src, os.PathLike) or hasattr(src, 'read'):
+        src = html.escape(_media_url(src, 'video/mp4'), quote=True)
 
     tag_fields = ['autoplay', 'loop', 'muted']
     tags = ' '.join(t for t in tag_fields if kwargs[t])
     value_fields = ['height', 'width', 'poster']
 
-    values = ' '.join('%s="%s"' % (k, html.escape(kwargs[k], quote=True))
+    values = ' '.join('%s="%s"' % (k, html.escape(str(kwargs[k]), quote=True))
                       for k in value_fields if kwargs[k] is not None)
+    if src:
+        values += ' src="%s"' % src
 
-    tag = r'<video src="{src}" controls {tags} {values} preload="metadata"><video/>'.format(
-        src=src, tags=tags, values=values)
+    tag = r'<video id="{dom_id}" controls {tags} {values} preload="metadata"></video>{script}'.format(
+        dom_id=dom_id, tags=tags, values=values, script=script)
     return put_html(tag, scope=scope, position=position)
 
 
-def put_audio(src: Union[str, bytes], autoplay: bool = False, loop: bool = False,
+def put_audio(src: Union[str, bytes, os.PathLike, BinaryIO], autoplay: bool = False, loop: bool = False,
               muted: bool = False, scope: str = None, position: int = OutputPosition.BOTTOM) -> Output:
     """Output audio
 
-    :param str/bytes src: Source of audio. It can be a string specifying video URL, a bytes-like object specifying
-        the binary content of the audio.
+    :param str/bytes/path-like/file-like src: Source of audio. It can be a string specifying audio URL,
+        a bytes-like object specifying the binary content of the audio,
+        a path-like object (e.g. `pathlib.Path`) specifying the local audio file,
+        or a seekable binary file-like object.
+        Same as `put_video()`, the local file and file-like object are streamed to the browser via the media server.
     :param bool autoplay: Whether to autoplay the audio.
 
       .. note::
@@ -323,18 +874,200 @@ def put_audio(src: Union[str, bytes], autoplay: bool = False, loop: bool = False
         put_audio(url)
 
     .. versionadded:: 0.4
+
+    .. versionchanged:: 0.8
+       support local file and file-like object as ``src``
     """
     kwargs = locals()
+    dom_id = 'webio-media-' + random_str(10)
+    script = ''
     if isinstance(src, (bytes, bytearray)):
-        src = 'data:audio/wav;base64, ' + base64.b64encode(src).decode('ascii')
+        src, script = _blob_src(src, 'audio/wav', dom_id)
+    elif isinstance(src, os.PathLike) or hasattr(src, 'read'):
+        src = html.escape(_media_url(src, 'audio/mpeg'), quote=True)
 
     tag_fields = ['autoplay', 'loop', 'muted']
     tags = ' '.join(t for t in tag_fields if kwargs[t])
 
-    tag = r'<audio src="{src}" {tags} controls preload="metadata"><audio/>'.format(src=src, tags=tags)
+    src = 'src="%s"' % src if src else ''
+
+    tag = r'<audio id="{dom_id}" {src} {tags} controls preload="metadata"></audio>{script}'.format(
+        dom_id=dom_id, src=src, tags=tags, script=script)
     return put_html(tag, scope=scope, position=position)
 
 
+def _init_video_stream_client():
+    session = get_current_session()
+    if 'video_stream_client_flag' not in session.internal_save:
+        session.internal_save['video_stream_client_flag'] = True
+        run_js("""
+        window.WebIOVideoStream = {
+            streams: {},
+            create: function(dom_id, mime_type) {
+                let video = document.getElementById(dom_id), media_source = new MediaSource();
+                let stream = {media_source: media_source, buffer: null, queue: [], queued_bytes: 0, ended: false,
+                              drain_waiters: []};
+                this.streams[dom_id] = stream;
+                media_source.addEventListener('sourceopen', () => {
+                    stream.buffer = media_source.addSourceBuffer(mime_type);
+                    stream.buffer.mode = 'sequence';
+                    stream.buffer.addEventListener('updateend', () => this.pump(stream, video));
+                    this.pump(stream, video);
+                });
+                video.src = URL.createObjectURL(media_source);
+            },
+            append: function(dom_id, content) {
+                let stream = this.streams[dom_id];
+                if (!stream) return;
+                let raw = atob(content), bytes = new Uint8Array(raw.length);
+                for (let i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+                stream.queue.push(bytes);
+                stream.queued_bytes += bytes.length;
+                this.pump(stream, document.getElementById(dom_id));
+            },
+            end: function(dom_id) {
+                let stream = this.streams[dom_id];
+                if (!stream) return;
+                stream.ended = true;
+                this.pump(stream, document.getElementById(dom_id));
+            },
+            // return a promise which resolves with the queued bytes when the queued bytes drop below `low_bytes`
+            drain: function(dom_id, low_bytes) {
+                let stream = this.streams[dom_id];
+                if (!stream || stream.queued_bytes <= low_bytes) return stream ? stream.queued_bytes : 0;
+                return new Promise(resolve => stream.drain_waiters.push([low_bytes, resolve]));
+            },
+            pump: function(stream, video) {
+                if (!stream.buffer || stream.buffer.updating || stream.media_source.readyState !== 'open') return;
+                if (stream.queue.length) {
+                    try {
+                        stream.buffer.appendBuffer(stream.queue[0]);
+                        stream.queued_bytes -= stream.queue.shift().length;
+                    } catch (e) {
+                        if (e.name !== 'QuotaExceededError' || !video || video.currentTime < 10) throw e;
+                        stream.buffer.remove(0, video.currentTime - 5);  // evict the played data and retry on updateend
+                    }
+                } else if (stream.ended) {
+                    stream.media_source.endOfStream();
+                }
+                stream.drain_waiters = stream.drain_waiters.filter(([low_bytes, resolve]) => {
+                    if (stream.queued_bytes > low_bytes) return true;
+                    resolve(stream.queued_bytes);
+                });
+            }
+        };
+        """)
+
+
+class _VideoStream:
+    def __init__(self, dom_id: str, max_pending_bytes: int):
+        self.dom_id = dom_id
+        self.max_pending_bytes = max_pending_bytes
+        self.pending_bytes = 0  # the bytes sent to browser but may not be appended to the media buffer
+
+
+def put_video_stream(name: str, mime_type: str = 'video/mp4; codecs="avc1.42E01E"', autoplay: bool = True,
+                     muted: bool = True, height: int = None, width: int = None, max_pending_bytes: int = 8 * 1024 * 1024,
+                     scope: str = None, position: int = OutputPosition.BOTTOM) -> Output:
+    """Output a video widget that plays the video content generated on the fly.
+
+    Use `video_stream_append()` to push the video data to the widget and `video_stream_end()` to end the video.
+    The video data is appended to the browser's `MediaSource <https://developer.mozilla.org/en-US/docs/Web/API/MediaSource>`_,
+    so the playback can start once the first segment is received.
+
+    :param str name: the name of the widget, must unique in session-wide.
+    :param str mime_type: The MIME type of the video data, including the codecs.
+        The video data must be in the format supported by MediaSource, e.g. fragmented MP4 or WebM.
+        Use ``MediaSource.isTypeSupported(mime_type)`` in browser to check whether the type is supported.
+    :param bool autoplay: Whether to play the video once the first segment is received.
+        Most browsers only allow autoplay when ``muted`` is enabled.
+    :param bool muted: If set, the audio will be initially silenced.
+    :param int width, height: The size of the video's display area, in CSS pixels.
+    :param int max_pending_bytes: The max bytes of the video data that sent to the browser but not yet consumed.
+        When exceeded, `video_stream_append()` (or `video_stream_append_async()`) waits until the browser catches up.
+    :param int scope, position: Those arguments have the same meaning as for :func:`put_text() <pywebio.output.put_text>`
+
+    Example::
+
+        put_video_stream('camera', mime_type='video/webm; codecs="vp8"')
+        for chunk in webm_chunks():
+            video_stream_append('camera', chunk)
+        video_stream_end('camera')
+
+    .. versionadded:: 0.8
+    """
+    _init_video_stream_client()
+    dom_id = "webio-video-stream-%s" % name
+    get_current_session().internal_save.setdefault('video_streams', {})[name] = _VideoStream(dom_id, max_pending_bytes)
+
+    attrs = ' '.join(t for t, enabled in [('autoplay', autoplay), ('muted', muted)] if enabled)
+    attrs += ''.join(' %s="%s"' % (k, int(v)) for k, v in [('height', height), ('width', width)] if v is not None)
+    tag = '<video id="{dom_id}" controls {attrs}></video><script>WebIOVideoStream.create({args})</script>'.format(
+        dom_id=dom_id, attrs=attrs, args=', '.join(json.dumps(i) for i in [dom_id, mime_type]))
+    return put_html(tag, scope=scope, position=position)
+
+
+def _get_video_stream(name: str) -> _VideoStream:
+    stream = get_current_session().internal_save.get('video_streams', {}).get(name)
+    if stream is None:
+        raise ValueError("Video stream %r not found, use `put_video_stream()` to create it first" % name)
+    return stream
+
+
+def video_stream_append(name: str, chunk: bytes):
+    """Append video data to the video stream widget created by `put_video_stream()`
+
+    This function blocks when there are too much data that the browser hasn't consumed,
+    see ``max_pending_bytes`` parameter of `put_video_stream()`.
+    Only available in thread-based session, use `video_stream_append_async()` in coroutine-based session.
+
+    :param str name: the name of the video stream widget
+    :param bytes chunk: the video data, the chunks appended should form a valid fragmented MP4 or WebM stream.
+
+    .. versionadded:: 0.8
+    """
+    if isinstance(get_current_session(), CoroutineBasedSession):
+        raise RuntimeError("`video_stream_append()` can't be used in coroutine-based session, "
+                           "use `await video_stream_append_async()` instead")
+    stream = _get_video_stream(name)
+    if stream.pending_bytes + len(chunk) > stream.max_pending_bytes:
+        # wait until the browser consumes half of the pending data
+        stream.pending_bytes = eval_js("WebIOVideoStream.drain(dom_id, low_bytes)",
+                                       dom_id=stream.dom_id, low_bytes=stream.max_pending_bytes // 2) or 0
+    _video_stream_send(stream, chunk)
+
+
+async def video_stream_append_async(name: str, chunk: bytes):
+    """Append video data to the video stream widget, the asyncio version of `video_stream_append()`
+
+    Waiting for the browser to consume the pending data won't block the event loop, so it's suitable for
+    :ref:`coroutine-based session <coroutine_based_session>`.
+
+    .. versionadded:: 0.8
+    """
+    stream = _get_video_stream(name)
+    if stream.pending_bytes + len(chunk) > stream.max_pending_bytes:
+        stream.pending_bytes = await eval_js("WebIOVideoStream.drain(dom_id, low_bytes)",
+                                             dom_id=stream.dom_id, low_bytes=stream.max_pending_bytes // 2) or 0
+    _video_stream_send(stream, chunk)
+
+
+def _video_stream_send(stream, chunk: bytes):
+    run_js("WebIOVideoStream.append(dom_id, content)", dom_id=stream.dom_id,
+           content=base64.b64encode(chunk).decode('ascii'))
+    stream.pending_bytes += len(chunk)
+
+
+def video_stream_end(name: str):
+    """End the video stream widget created by `put_video_stream()`, the video ends after the appended data is played.
+
+    .. versionadded:: 0.8
+    """
+    stream = _get_video_stream(name)
+    run_js("WebIOVideoStream.end(dom_id)", dom_id=stream.dom_id)
+    get_current_session().internal_save['video_streams'].pop(name, None)
+
+
 def wait_scroll_to_bottom(threshold: float = 10, timeout: float = None) -> bool:
     r"""Wait until the page is scrolled to bottom.
 
@@ -0,0 +1,388 @@
+"""
+Serve local media files to the browser over HTTP, with Range request support,
+so that the browser can stream and seek the media instead of receiving the whole content in one message.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import json
+import mimetypes
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import tornado.httpserver
+import tornado.iostream
+import tornado.netutil
+import tornado.web
+from pywebio.session import get_current_session, defer_call, run_js
+from pywebio.session import info as session_info
+from pywebio.utils import random_str
+
+__all__ = ['config_media_server', 'MediaHandler']
+
+
+class _MediaSource:
+    """A registered media, a local file or a seekable file-like object"""
+
+    def __init__(self, src, mime_type: str):
+        self.mime_type = mime_type
+        self.lock = threading.Lock()
+        self.fileobj = None
+        self.mmap = None
+        self.closed = False
+        if isinstance(src, (str, os.PathLike)):
+            self.path = os.fspath(src)
+            self.size = os.path.getsize(self.path)
+        else:
+            self.path = None
+            self.fileobj = src
+            self.size = src.seek(0, os.SEEK_END)
+
+    def read(self, start: int, length: int) -> bytes:
+        with self.lock:
+            if self.closed:  # unregistered while the response is being sent
+                return b''
+            if self.path is not None:
+                if self.mmap is None:
+                    if self.size == 0:
+                        return b''
+                    with open(self.path, 'rb') as f:
+                        self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                return self.mmap[start:start + length]
+            self.fileobj.seek(start)
+            return self.fileobj.read(length)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.mmap is not None:
+                self.mmap.close()
+                self.mmap = None
+
+
+class _BlobCache:
+    """Process-wide LRU cache of the media binary content, keyed by the hash of the content"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.blobs = OrderedDict()  # digest -> [data, mime_type, base64 encoded data or None]
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def add(self, data: bytes, mime_type: str) -> str:
+        digest = self.digest(data)
+        with self.lock:
+            if digest in self.blobs:
+                self.blobs.move_to_end(digest)
+                return digest
+            self.blobs[digest] = [bytes(data), mime_type, None]
+            self.size += len(data)
+            while self.size > self.max_size and len(self.blobs) > 1:
+                _, (evicted, _, encoded) = self.blobs.popitem(last=False)
+                self.size -= len(evicted) + len(encoded or '')
+        return digest
+
+    def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        with self.lock:
+            item = self.blobs.get(digest)
+            if item is None:
+                return None
+            self.blobs.move_to_end(digest)
+            return item[0], item[1]
+
+    def get_base64(self, data: bytes, digest: str) -> str:
+        """Return the base64 encoded data, cache the encoded result if the data is in cache"""
+        with self.lock:
+            item = self.blobs.get(digest)
+            if item is not None and item[2] is not None:
+                return item[2]
+        encoded = base64.b64encode(data).decode('ascii')
+        with self.lock:
+            item = self.blobs.get(digest)
+            if item is not None and item[2] is None:
+                item[2] = encoded
+                self.size += len(encoded)
+        return encoded
+
+
+_blob_cache = _BlobCache(64 * 1024 * 1024)
+
+
+class _MediaRegistry:
+    """The media sources that can be accessed via the media server, keyed by token"""
+
+    def __init__(self):
+        self.secret = os.urandom(32)
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def sign(self, token: str) -> str:
+        return hmac.new(self.secret, token.encode('ascii'), hashlib.sha256).hexdigest()[:32]
+
+    def get(self, token: str, signature: str) -> Optional[_MediaSource]:
+        if not hmac.compare_digest(self.sign(token), signature):
+            return None
+        if token.startswith('blob_'):  # content-addressed media, see `_blob_src()`
+            blob = _blob_cache.get(token[5:])
+            return _MediaSource(io.BytesIO(blob[0]), blob[1]) if blob else None
+        with self.lock:
+            return self.sources.get(token)
+
+    def register(self, source: _MediaSource) -> str:
+        """Register the media source to current session, return the signed url path of the media.
+        The media will be unregistered when the session closes."""
+        token = random_str(24)
+        with self.lock:
+            self.sources[token] = source
+
+        session = get_current_session()
+        if 'media_tokens' not in session.internal_save:
+            tokens = session.internal_save['media_tokens'] = []
+            defer_call(lambda: self.unregister(tokens))
+        session.internal_save['media_tokens'].append(token)
+        return '%s/%s' % (token, self.sign(token))
+
+    def unregister(self, tokens):
+        with self.lock:
+            sources = [self.sources.pop(t, None) for t in tokens]
+        for source in sources:
+            if source is not None:
+                source.close()
+
+
+_registry = _MediaRegistry()
+
+
+class MediaHandler(tornado.web.RequestHandler):
+    """Tornado request handler to serve the media of `put_video()` and `put_audio()`, with HTTP Range support.
+
+    The handler is mounted to a standalone server automatically. If you want to serve the media in your own
+    Tornado application, mount this handler with the url pattern ``r"/prefix/(\\w+)/(\\w+)"``, and call
+    ``config_media_server(url_prefix='/prefix', start_server=False)``.
+    This is required when the app is served over HTTPS or behind a reverse proxy, since the standalone server
+    only serves HTTP on its own port. For example::
+
+        import tornado.ioloop
+        import tornado.web
+        from pywebio.platform.tornado import webio_handler
+
+        config_media_server(url_prefix='/media', start_server=False)
+        app = tornado.web.Application([
+            (r"/", webio_handler(main)),
+            (r"/media/(\\w+)/(\\w+)", MediaHandler),
+        ])
+        app.listen(8080)
+        tornado.ioloop.IOLoop.current().start()
+    """
+    chunk_size = 256 * 1024
+
+    async def get(self, token: str, signature: str):
+        await self._serve(token, signature, include_body=True)
+
+    async def head(self, token: str, signature: str):
+        await self._serve(token, signature, include_body=False)
+
+    async def _serve(self, token: str, signature: str, include_body: bool):
+        source = _registry.get(token, signature)
+        if source is None:
+            raise tornado.web.HTTPError(404)
+
+        start, end = 0, source.size
+        range_header = self.request.headers.get('Range')
+        if range_header and source.size:
+            byte_range = _parse_range(range_header, source.size)
+            if byte_range is None:
+                self.set_header('Content-Range', 'bytes */%s' % source.size)
+                raise tornado.web.HTTPError(416)
+            start, end = byte_range
+            self.set_status(206)
+            self.set_header('Content-Range', 'bytes %s-%s/%s' % (start, end - 1, source.size))
+
+        self.set_header('Accept-Ranges', 'bytes')
+        self.set_header('Content-Type', source.mime_type)
+        self.set_header('Content-Length', end - start)
+        if token.startswith('blob_'):  # the content never changes for the same url
+            self.set_header('Cache-Control', 'public, max-age=31536000, immutable')
+        else:
+            self.set_header('Cache-Control', 'private, max-age=3600')
+        if not include_body:
+            return
+
+        loop = asyncio.get_event_loop()
+        while start < end:
+            length = min(self.chunk_size, end - start)
+            # read in executor to not block the server on slow disks
+            chunk = await loop.run_in_executor(None, source.read, start, length)
+            if not chunk:
+                break
+            self.write(chunk)
+            start += len(chunk)
+            try:
+                await self.flush()
+            except tornado.iostream.StreamClosedError:
+                return
+
+
+def _parse_range(range_header: str, size: int):
+    """Parse the HTTP Range header, return the ``(start, end)`` of the first range (end is exclusive),
+    return ``None`` when the range is not satisfiable."""
+    unit, _, ranges = range_header.partition('=')
+    if unit.strip() != 'bytes':
+        return None
+    first, _, last = ranges.split(',')[0].strip().partition('-')
+    try:
+        if not first:  # suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size
+        else:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+    if start >= end:
+        return None
+    return start, end
+
+
+class _MediaServer:
+    def __init__(self):
+        self.host = '0.0.0.0'
+        self.port = 0
+        self.url_prefix = None
+        self.start_server = True
+        self.serve_bytes = False
+        self.bound_port = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.bound_port is not None or not self.start_server:
+                return
+            sockets = tornado.netutil.bind_sockets(self.port, self.host)
+            self.bound_port = sockets[0].getsockname()[1]
+
+            def run():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                server = tornado.httpserver.HTTPServer(tornado.web.Application([(r"/(\w+)/(\w+)", MediaHandler)]))
+                server.add_sockets(sockets)
+                loop.run_forever()
+
+            threading.Thread(target=run, daemon=True, name='pywebio_battery_media_server').start()
+
+    def url(self, path: str) -> str:
+        if self.url_prefix is not None:
+            self.start()
+            return '%s/%s' % (self.url_prefix.rstrip('/'), path)
+
+        if _is_https_page():
+            # the browser blocks the HTTP media in HTTPS page, and the random port is usually not reachable
+            # through the reverse proxy which terminates the TLS
+            raise RuntimeError("The standalone media server only serves HTTP, it can't be used in an HTTPS page. "
+                               "Mount `MediaHandler` in your Tornado application and call "
+                               "`config_media_server(url_prefix=..., start_server=False)`, "
+                               "or serve the media server via HTTPS and set `url_prefix`.")
+        self.start()
+        # the media server is in the same host with PyWebIO server
+        server_host = session_info.server_host
+        hostname = server_host.rsplit(':', 1)[0] if not server_host.endswith(']') else server_host
+        return '//%s:%s/%s' % (hostname or 'localhost', self.bound_port, path)
+
+
+def _is_https_page() -> bool:
+    """Whether the page of current session is served over HTTPS"""
+    if (session_info.origin or '').lower().startswith('https:'):
+        return True
+    request = session_info.request
+    headers = getattr(request, 'headers', None) or {}
+    return getattr(request, 'protocol', None) == 'https' or \
+        headers.get('X-Forwarded-Proto', '').lower() == 'https'
+
+
+_server = _MediaServer()
+
+
+def config_media_server(url_prefix: str = None, host: str = '0.0.0.0', port: int = 0, start_server: bool = True,
+                        serve_bytes: bool = False, cache_size: int = 64 * 1024 * 1024):
+    """Config the media server which serves the local media files of `put_video()` and `put_audio()`.
+
+    By default, a standalone HTTP server is started on a random port of the PyWebIO server host when a local media
+    file is first output, and the media url is ``//{pywebio_server_hostname}:{port}/...``.
+    The standalone server can't be used when the app is served over HTTPS (outputting a local media file raises
+    ``RuntimeError``) or behind a reverse proxy, mount `MediaHandler` in your Tornado application and set
+    ``url_prefix`` in this case.
+
+    When the binary content (bytes) of media is output, the content is cached by its hash. In a session, the same
+    content is only sent to the browser once, the later outputs reuse the content already in the browser.
+
+    :param str url_prefix: The url prefix of the media server, e.g. ``'https://example.com/media'``.
+        Required when the media server is behind a reverse proxy or mounted to your own Tornado application
+        (see `MediaHandler`).
+    :param str host: The address the standalone media server binds to.
+    :param int port: The port the standalone media server listens on, ``0`` means a random free port.
+    :param bool start_server: Whether to start the standalone media server.
+        Set to ``False`` when `MediaHandler` is mounted in your own Tornado application,
+        in this case, ``url_prefix`` must be provided.
+    :param bool serve_bytes: Whether to serve the binary content of media via the media server too.
+        In this way, the same content has the same url, so it can also be reused by the browser across sessions.
+    :param int cache_size: The max size in bytes of the binary media content cache.
+        The least recently used content is evicted when exceeded.
+
+    Must be called before any local media file is output.
+
+    .. versionadded:: 0.8
+    """
+    if not start_server and url_prefix is None:
+        raise ValueError("`url_prefix` is required when `start_server=False`")
+    with _server.lock:
+        if _server.bound_port is not None:
+            raise RuntimeError("The media server is already started")
+        _server.url_prefix = url_prefix
+        _server.host = host
+        _server.port = port
+        _server.start_server = start_server
+        _server.serve_bytes = serve_bytes
+    with _blob_cache.lock:
+        _blob_cache.max_size = cache_size
+
+
+def _media_url(src, default_mime_type: str) -> str:
+    """Register the local media file (path-like object) or file-like object to current session,
+    return the url to access it."""
+    mime_type = default_mime_type
+    if isinstance(src, (str, os.PathLike)):
+        mime_type = mimetypes.guess_type(os.fspath(src))[0] or default_mime_type
+    path = _registry.register(_MediaSource(src, mime_type))
+    return _server.url(path)
+
+
+def _blob_src(data: bytes, mime_type: str, dom_id: str) -> Tuple[str, str]:
+    """Get the ``src`` of the media element for the media binary content.
+    Return the ``(src, script)`` tuple, the script must be output after the element whose id is ``dom_id``.
+    """
+    digest = _blob_cache.add(data, mime_type)
+    if _server.serve_bytes:
+        token = 'blob_' + digest
+        return _server.url('%s/%s' % (token, _registry.sign(token))), ''
+
+    # send the content to the browser only once per session, and reuse it via object url
+    delivered = get_current_session().internal_save.setdefault('media_blobs', set())
+    if digest not in delivered:
+        delivered.add(digest)
+        run_js("""
+        window.WebIOMediaCache = window.WebIOMediaCache || {};
+        let raw = atob(content), bytes = new Uint8Array(raw.length);
+        for (let i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+        WebIOMediaCache[digest] = URL.createObjectURL(new Blob([bytes], {type: mime_type}));
+        """, content=_blob_cache.get_base64(data, digest), digest=digest, mime_type=mime_type)
+    script = '<script>document.getElementById(%s).src = WebIOMediaCache[%s];</script>' % (
+        json.dumps(dom_id), json.dumps(digest))
+    return '', script
@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from pywebio.session import get_current_session, get_current_task_id
+from pywebio.session.coroutinebased import CoroutineBasedSession
+
+logger = logging.getLogger(__name__)
+
+
+_claim_lock = threading.Lock()
+
+
+class _TimerHandle:
+    __slots__ = ('callback', 'cancelled')
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def claim(self) -> bool:
+        """Mark the handle as done before running the callback, return ``False`` if it's already cancelled or done,
+        so that the callback won't run twice when it's run early."""
+        with _claim_lock:
+            if self.cancelled:
+                return False
+            self.cancelled = True
+            return True
+
+    def run(self):
+        if not self.claim():
+            return
+        try:
+            self.callback()
+        except Exception:
+            logger.exception("Error in delayed callback %r", self.callback)
+
+
+class _TimerThread:
+    """A process-wide timer thread, so that delayed callbacks don't need a thread for each of them"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay: float, callback) -> _TimerHandle:
+        handle = _TimerHandle(callback)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='pywebio_battery_timer')
+                self._thread.start()
+            self._cond.notify()
+        return handle
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                deadline, _, handle = self._heap[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    continue
+                heapq.heappop(self._heap)
+            handle.run()
+
+
+_timer_thread = _TimerThread()
+
+
+class _CloseFlusher(threading.Thread):
+    """Run the pending delayed callbacks of a thread-based session before the session closes.
+
+    ThreadBasedSession joins the registered threads after the main task returns and before it closes the session,
+    so the flusher is registered to the session and idles until it's joined.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, session):
+        super().__init__(daemon=True, name='pywebio_battery_flusher')
+        self.handles = set()
+        self.stopped = threading.Event()
+        session.register_thread(self)
+        session.defer_call(self.stopped.set)  # the session is closed by the user
+        self.start()
+
+    @classmethod
+    def of(cls, session) -> '_CloseFlusher':
+        with cls._lock:
+            flusher = session.internal_save.get('close_flusher')
+            if flusher is None or flusher.stopped.is_set():
+                flusher = session.internal_save['close_flusher'] = cls(session)
+            return flusher
+
+    def run(self):
+        self.stopped.wait()
+
+    def call_later(self, delay: float, callback) -> _TimerHandle:
+        handle = _timer_thread.call_later(delay, callback)
+        with self._lock:
+            self.handles = {h for h in self.handles if not h.cancelled}
+            self.handles.add(handle)
+        return handle
+
+    def join(self, timeout=None):
+        with self._lock:
+            handles, self.handles = self.handles, set()
+        for handle in handles:
+            handle.run()
+        self.stopped.set()
+        super().join(timeout)
+
+
+class SessionContext:
+    """Capture the current session, so that messages can be sent to it outside the session context,
+    e.g. in a timer callback.
+    """
+
+    def __init__(self):
+        self.session = get_current_session()
+        self.task_id = get_current_task_id()
+
+    @property
+    def is_coroutine_based(self) -> bool:
+        return isinstance(self.session, CoroutineBasedSession)
+
+    def closed(self) -> bool:
+        return self.session.closed()
+
+    def run_js(self, code: str, **args):
+        """Same as `pywebio.session.run_js()`, but can be called outside the session context.
+        Do nothing when the session is closed."""
+        if self.session.closed():
+            return
+        self.session.send_task_command(dict(command='run_script', spec=dict(code=code, args=args),
+                                            task_id=self.task_id))
+
+    def call_later(self, delay: float, callback):
+        """Run ``callback()`` after ``delay`` seconds, return a handle with a ``cancel()`` method.
+
+        In coroutine-based session, the callback is run in a task of the session, otherwise,
+        it is run in a process-wide timer thread. The callback should use `SessionContext.run_js()`
+        to send messages to the session.
+
+        The session is kept open until the pending callbacks are run, so the messages sent by them are not lost
+        when the main task of the session returns in the delay. In thread-based session, the pending callbacks
+        are run right after the main task returns.
+        """
+        if not self.is_coroutine_based:
+            return _CloseFlusher.of(self.session).call_later(delay, callback)
+
+        handle = _TimerHandle(callback)
+        if self.session.closed():
+            handle.cancel()
+            return handle
+
+        async def run_later():
+            await asyncio.sleep(delay)
+            handle.run()
+
+        self.session.run_async(run_later())
+        return handle
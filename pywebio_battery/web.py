@@ -1,26 +1,136 @@
+import asyncio
+import contextlib
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import deque, OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
 from pywebio.input import *
 from pywebio.output import *
 from pywebio.session import *
 from pywebio.session import get_current_session
+from pywebio.session import info as session_info
+from pywebio.session.coroutinebased import CoroutineBasedSession
 from tornado.web import create_signed_value, decode_signed_value
 from typing import *
 
-__all__ = ['get_all_query', 'get_query', 'set_localstorage', 'get_localstorage', 'clear_localstorage', 'set_cookie', 'get_cookie',
-           'basic_auth', 'custom_auth', 'revoke_auth']
+from .utils import SessionContext
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-def get_all_query():
-    """Get URL parameter (also known as "query strings" or "URL query parameters") as a dict"""
-    query = eval_js("Object.fromEntries(new URLSearchParams(window.location.search))")
-    return query
+__all__ = ['get_all_query', 'get_query', 'refresh_query', 'set_localstorage', 'get_localstorage', 'clear_localstorage', 'set_cookie', 'get_cookie',
+           'set_localstorage_many', 'get_localstorage_many', 'set_cookie_many', 'get_cookie_many', 'local_state',
+           'basic_auth', 'custom_auth', 'revoke_auth', 'config_auth', 'MemoryRevocationStore', 'FileRevocationStore']
+
+
+def _request_header(name: str) -> Optional[str]:
+    """Get the header of the request that creates the session.
+    Return ``None`` if the request of the session is not available, return ``''`` if the header is not present."""
+    request = session_info.request
+    if request is None:
+        return None
+    headers = getattr(request, 'headers', None)
+    if headers is not None:  # tornado, flask, aiohttp, starlette, django>=2.2
+        return headers.get(name, '')
+    # django<2.2
+    return getattr(request, 'META', {}).get('HTTP_' + name.upper().replace('-', '_'), '')
+
+
+def _then(value, func: Callable):
+    """Return ``func(value)``, or an awaitable of it if ``value`` is an awaitable (in coroutine-based session)"""
+    if inspect.isawaitable(value):
+        async def then():
+            return func(await value)
 
+        return then()
+    return func(value)
 
-def get_query(name: str):
-    """Get URL parameter value"""
-    query = eval_js("new URLSearchParams(window.location.search).get(n)", n=name)
+
+def _page_query(refresh=False):
+    """Get the URL parameters of the page, parsed once per session.
+    Return an awaitable in coroutine-based session."""
+    session = get_current_session()
+    if refresh or 'page_query' not in session.internal_save:
+        search = None
+        # The url of the request that creates the session is not the page url, but the page url is sent as the
+        # referrer by some browsers. The query of the referrer may be stripped by the referrer policy, so only
+        # a non-empty query is trusted.
+        referer = None if refresh else _request_header('Referer')
+        if referer and urlparse(referer).query:
+            search = urlparse(referer).query
+        if search is None:
+            search = eval_js("window.location.search")
+
+        def parse(search: str) -> Dict[str, List[str]]:
+            session.internal_save['page_query'] = parse_qs(search.lstrip('?'), keep_blank_values=True)
+            return session.internal_save['page_query']
+
+        query = _then(search, parse)
+    else:
+        query = session.internal_save['page_query']
+    if _in_coroutine_session() and not inspect.isawaitable(query):
+        # keep the functions awaitable in coroutine-based session even if no message is sent to the browser
+        query = _maybe_await(query)
     return query
 
 
+def get_all_query(multiple: bool = False):
+    """Get URL parameter (also known as "query strings" or "URL query parameters") as a dict
+
+    The URL parameters are parsed only once in a session, use `refresh_query()` to parse them again when
+    the URL is changed by the app (e.g. via ``history.pushState()``).
+    In coroutine-based session, this function and `get_query()`, `refresh_query()` should be awaited.
+
+    :param bool multiple: Whether to return all the values of the parameters.
+       If ``True``, the value of each parameter in returned dict is a list,
+       otherwise, it's the last value of the parameter.
+
+    .. versionchanged:: 0.8
+       add ``multiple`` parameter
+    """
+    def get(query):
+        if multiple:
+            return {name: list(values) for name, values in query.items()}
+        return {name: values[-1] for name, values in query.items()}
+
+    return _then(_page_query(), get)
+
+
+def get_query(name: str, multiple: bool = False):
+    """Get URL parameter value
+
+    :param bool multiple: Whether to return all the values of the parameter as a list.
+       If ``False``, return the first value of the parameter.
+       ``None`` (or an empty list when ``multiple=True``) is returned if the parameter is not present.
+
+    .. versionchanged:: 0.8
+       add ``multiple`` parameter
+    """
+    def get(query):
+        values = query.get(name, [])
+        if multiple:
+            return list(values)
+        return values[0] if values else None
+
+    return _then(_page_query(), get)
+
+
+def refresh_query():
+    """Read the URL parameters from the browser again, used when the URL is changed after the page is loaded
+
+    .. versionadded:: 0.8
+    """
+    return _then(_page_query(refresh=True), lambda query: None)
+
+
 def set_localstorage(key: str, value: str):
     """Save data to user's web browser
 
@@ -45,6 +155,113 @@ def clear_localstorage():
     return eval_js("localStorage.clear()")
 
 
+def set_localstorage_many(mapping: Mapping[str, str]):
+    """Save multiple key-value pairs to user's web browser local storage in one message
+
+    .. versionadded:: 0.8
+    """
+    run_js("for (const [key, value] of Object.entries(mapping)) localStorage.setItem(key, value)",
+           mapping=dict(mapping))
+
+
+def get_localstorage_many(keys: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Get the values of multiple keys in user's web browser local storage with only one round trip to the browser
+
+    :return: a dict maps the key to its value, the value is ``None`` if the key doesn't exist.
+
+    .. versionadded:: 0.8
+    """
+    return eval_js("Object.fromEntries(keys.map(key => [key, localStorage.getItem(key)]))", keys=list(keys))
+
+
+class LocalState(MutableMapping):
+    """Server side mirror of user's web browser local storage, see `local_state()`"""
+
+    def __init__(self, sync_delay: float, data: Dict[str, str]):
+        self.sync_delay = sync_delay
+        self._data = data
+        self._changes = {}  # key -> new value, ``None`` means deleted
+        self._context = SessionContext()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> str:
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: str):
+        value = str(value)  # local storage only stores string
+        if self._data.get(key) == value:
+            return
+        self._data[key] = value
+        self._changed(key, value)
+
+    def __delitem__(self, key: str):
+        del self._data[key]
+        self._changed(key, None)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'LocalState(%r)' % self._data
+
+    def _changed(self, key: str, value: Optional[str]):
+        with self._lock:
+            self._changes[key] = value
+            if self._timer is None:
+                self._timer = self._context.call_later(self.sync_delay, self.sync)
+
+    def sync(self):
+        """Write the pending changes to the browser immediately"""
+        with self._lock:
+            changes, self._changes = self._changes, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if changes:
+            self._context.run_js("""for (const [key, value] of Object.entries(changes))
+                value === null ? localStorage.removeItem(key) : localStorage.setItem(key, value)""", changes=changes)
+
+
+def local_state(sync_delay: float = 0.5) -> LocalState:
+    """Get a dict-like object which mirrors user's web browser local storage.
+
+    All the keys are loaded from the browser on first call, after that, reading the object costs no round trip to
+    the browser. The changes to the object are written to the browser in batch after ``sync_delay`` seconds,
+    call ``local_state().sync()`` to write the pending changes immediately. The pending changes are also written
+    before the session closes, so the changes made right before the session ends are not lost.
+
+    The object is shared in a session. The changes to the local storage that are not made via this object
+    (e.g. by `set_localstorage()`) are not reflected in it.
+
+    :param float sync_delay: The delay in seconds to write the changes to the browser,
+        the changes in this period are sent in one message. Only takes effect on the first call in a session.
+
+    Example::
+
+        state = local_state()
+        state['visits'] = int(state.get('visits', 0)) + 1
+
+    In coroutine-based session, this function should be awaited (``state = await local_state()``),
+    the methods of the returned object are synchronous.
+
+    .. versionadded:: 0.8
+    """
+    session = get_current_session()
+    if 'local_state' in session.internal_save:
+        state = session.internal_save['local_state']
+        return _maybe_await(state) if _in_coroutine_session() else state
+
+    def create(data: Dict[str, str]) -> LocalState:
+        # the state may be created by another task of the session while the data is loading
+        return session.internal_save.setdefault('local_state', LocalState(sync_delay, data))
+
+    return _then(eval_js("Object.fromEntries(Object.entries(localStorage))"), create)
+
+
 def _init_cookie_client():
     session = get_current_session()
     if 'cookie_client_flag' not in session.internal_save:
@@ -73,20 +290,365 @@ def _init_cookie_client():
         """)
 
 
+def _parse_cookie_header(header: str) -> Dict[str, str]:
+    cookies = {}
+    for item in header.split(';'):
+        name, sep, value = item.strip().partition('=')
+        if sep and name not in cookies:  # the first one is the most specific one
+            cookies[name] = value
+    return cookies
+
+
+def _request_cookies() -> Optional[Dict[str, str]]:
+    """Get the cookies sent by the browser when the session is created, cached in session.
+    Return ``None`` if the request of the session is not available."""
+    session = get_current_session()
+    if 'request_cookies' not in session.internal_save:
+        header = _request_header('Cookie')
+        session.internal_save['request_cookies'] = _parse_cookie_header(header) if header is not None else None
+    return session.internal_save['request_cookies']
+
+
 def set_cookie(key: str, value: str, days=7):
     """Set cookie"""
-    _init_cookie_client()
-    run_js("setCookie(key, value, days)", key=key, value=value, days=days)
+    set_cookie_many({key: value}, days)
 
 
 def get_cookie(key: str):
-    """Get cookie"""
+    """Get cookie
+
+    The cookies are read from the request that creates the session, so no round trip to the browser is needed.
+    Only when the request is not available, the cookie is read from the browser.
+    In coroutine-based session, this function should be awaited.
+
+    .. versionchanged:: 0.8
+       read the cookies from the session request
+    """
+    cookies = _request_cookies()
+    if cookies is not None:
+        return _maybe_await(cookies.get(key)) if _in_coroutine_session() else cookies.get(key)
     _init_cookie_client()
     return eval_js("getCookie(key)", key=key)
 
 
+def set_cookie_many(mapping: Mapping[str, str], days=7):
+    """Set multiple cookies in one message
+
+    .. versionadded:: 0.8
+    """
+    cookies = _request_cookies()
+    if cookies is not None:
+        for key, value in mapping.items():
+            if days is not None and days < 0:  # expired
+                cookies.pop(key, None)
+            else:
+                cookies[key] = value or ''
+    _init_cookie_client()
+    run_js("for (const [key, value] of Object.entries(mapping)) setCookie(key, value, days)",
+           mapping=dict(mapping), days=days)
+
+
+def get_cookie_many(keys: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Get multiple cookies
+
+    :return: a dict maps the cookie name to its value, the value is ``None`` if the cookie doesn't exist.
+
+    .. versionadded:: 0.8
+    """
+    keys = list(keys)
+    cookies = _request_cookies()
+    if cookies is not None:
+        values = {key: cookies.get(key) for key in keys}
+        return _maybe_await(values) if _in_coroutine_session() else values
+    _init_cookie_client()
+    return eval_js("Object.fromEntries(keys.map(key => [key, getCookie(key)]))", keys=keys)
+
+
+def _get_token(token_name: str, token_storage: str) -> Optional[str]:
+    if token_storage == 'cookie':
+        return get_cookie(token_name)
+    return get_localstorage(token_name)
+
+
+def _set_token(token_name: str, token: str, token_storage: str, expire_days):
+    if token_storage == 'cookie':
+        set_cookie(token_name, token, days=expire_days)
+    else:
+        set_localstorage(token_name, token)
+
+
+class _LoginThrottle:
+    """Limit the failed login attempts of each username and each client IP in a period
+
+    At most ``max_keys`` usernames and client IPs are tracked, the least recently failed ones are dropped first,
+    so the memory is bounded when the attempts are made with random usernames.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.failures = OrderedDict()  # key -> deque of the failure time, in the order of the last failure
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def wait_time(self, keys: Sequence[tuple], max_attempts: int, period: float) -> float:
+        """Return the seconds to wait before next attempt is allowed, 0 means allowed"""
+        now = time.monotonic()
+        wait = 0
+        with self.lock:
+            for key in keys:
+                failures = self.failures.get(key)
+                while failures and failures[0] <= now - period:
+                    failures.popleft()
+                if not failures:
+                    self.failures.pop(key, None)
+                elif len(failures) >= max_attempts:
+                    wait = max(wait, failures[0] + period - now)
+        return wait
+
+    def record_failure(self, keys: Sequence[tuple], max_attempts: int):
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                self.failures.setdefault(key, deque(maxlen=max_attempts)).append(now)
+                self.failures.move_to_end(key)
+            while len(self.failures) > self.max_keys:
+                self.failures.popitem(last=False)
+
+    def reset(self, key: tuple):
+        with self.lock:
+            self.failures.pop(key, None)
+
+
+_login_throttle = _LoginThrottle()
+
+# In coroutine-based session, the verify functions are run in this thread pool, so that the slow verification
+# (e.g. bcrypt, LDAP) won't block the event loop. The coroutine verify functions in thread-based session are also
+# run in it. The concurrent verifications are bounded by the pool size.
+_auth_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pywebio_battery_auth')
+# In thread-based session, the normal verify functions are run in the session thread to keep the session context,
+# the concurrent verifications are bounded by this semaphore.
+_auth_slots = threading.BoundedSemaphore(4)
+
+
+def _in_coroutine_session() -> bool:
+    return isinstance(get_current_session(), CoroutineBasedSession)
+
+
+async def _maybe_await(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+def _token_timestamp(token: str) -> Optional[int]:
+    """Get the creation time of the token generated by `tornado.web.create_signed_value()`"""
+    parts = token.split('|')
+    try:
+        if parts[0] == '2':  # "2|key_version|timestamp|name|value|signature", fields are "length:value"
+            return int(parts[2].split(':', 1)[1])
+        return int(parts[-2])  # "value|timestamp|signature"
+    except (IndexError, ValueError):
+        return None
+
+
+def _token_id(token: str) -> str:
+    return hashlib.sha256(token.encode('utf8')).hexdigest()[:32]
+
+
+class MemoryRevocationStore:
+    """Store the revoked auth tokens in memory, only works in single process deployment.
+
+    The revoked tokens are kept until they expire, so the memory is bounded by the tokens revoked in
+    the max valid period of tokens.
+    """
+
+    def __init__(self):
+        self.revoked = {}  # token id -> expire time
+        self.lock = threading.Lock()
+        self._prune_size = 1024
+
+    def add(self, token_id: str, expires_at: float):
+        with self.lock:
+            self.revoked[token_id] = expires_at
+            if len(self.revoked) >= self._prune_size:  # amortized O(1)
+                now = time.time()
+                self.revoked = {k: v for k, v in self.revoked.items() if v > now}
+                self._prune_size = max(1024, len(self.revoked) * 2)
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self.revoked
+
+
+class FileRevocationStore(MemoryRevocationStore):
+    """Store the revoked auth tokens in a file, so they can be shared by multiple processes.
+
+    The revoked tokens are appended to the file, and the file is reloaded when it's modified by other processes.
+    The expired tokens are removed from the file when it's reloaded.
+
+    The writes to the file are serialized by an exclusive lock on ``path + '.lock'``, so the removing of the
+    expired tokens won't lose the tokens appended by other processes at the same time.
+    The lock is not available on Windows, where the expired tokens are kept in the file.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._version = None  # (mtime, size) of the loaded file
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read(self):
+        """Return the unexpired tokens in the file and the number of the expired ones"""
+        now, revoked, expired = time.time(), {}, 0
+        with open(self.path, encoding='utf8') as f:
+            for line in f:
+                token_id, _, expires_at = line.strip().partition(' ')
+                try:
+                    if float(expires_at) > now:
+                        revoked[token_id] = float(expires_at)
+                    else:
+                        expired += 1
+                except ValueError:  # incomplete line written by other process
+                    pass
+        return revoked, expired
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) == self._version:
+            return
+        revoked, expired = self._read()
+        if expired > len(revoked) and fcntl is not None:  # compact the file
+            with self._file_lock():
+                revoked, expired = self._read()  # read again, the file may be appended before locked
+                tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+                with open(tmp_path, 'w', encoding='utf8') as f:
+                    f.writelines('%s %s\n' % item for item in revoked.items())
+                os.replace(tmp_path, self.path)
+                stat = os.stat(self.path)
+        self.revoked = revoked
+        self._version = (stat.st_mtime_ns, stat.st_size)
+
+    def add(self, token_id: str, expires_at: float):
+        with self.lock:
+            with self._file_lock():
+                with open(self.path, 'a', encoding='utf8') as f:
+                    f.write('%s %s\n' % (token_id, expires_at))
+            self.revoked[token_id] = expires_at
+
+    def __contains__(self, token_id: str) -> bool:
+        with self.lock:
+            self._reload()
+            return token_id in self.revoked
+
+
+class _AuthConfig:
+    def __init__(self):
+        self.revocation_store = MemoryRevocationStore()
+        self.token_cache_size = 1024
+        # (secret, token name, token, expire days) -> (username, expire time), the recently verified tokens
+        self.verified_tokens = OrderedDict()
+        # the max valid days of the verified tokens, used to decide how long to keep the revoked tokens.
+        # 31 is the default max age of tornado's signed value
+        self.max_expire_days = 31
+        self.lock = threading.Lock()
+
+
+_auth_config = _AuthConfig()
+
+
+def config_auth(revocation_store: Union[MemoryRevocationStore, Any] = None, token_cache_size: int = 1024):
+    """Config the server side state of `basic_auth()` and `custom_auth()`
+
+    :param revocation_store: Where to store the tokens revoked by `revoke_auth()`, the revoked tokens are rejected
+        until they expire. Default is `MemoryRevocationStore`, use `FileRevocationStore` in multi-process deployment.
+        A custom store should implement ``add(token_id, expires_at)`` and ``__contains__(token_id)``.
+    :param int token_cache_size: The max number of the recently verified tokens to cache,
+        so the signature of the token is not verified again in later sessions.
+
+    .. versionadded:: 0.8
+    """
+    with _auth_config.lock:
+        if revocation_store is not None:
+            _auth_config.revocation_store = revocation_store
+        _auth_config.token_cache_size = token_cache_size
+        _auth_config.verified_tokens.clear()
+
+
+def _decode_token(secret, token_name: str, token: Optional[str], expire_days) -> Optional[str]:
+    """Decrypt the username from the token, return ``None`` if the token is invalid"""
+    if not token or _token_id(token) in _auth_config.revocation_store:
+        return None
+    key = (secret, token_name, token, expire_days)
+    now = time.time()
+    with _auth_config.lock:
+        cached = _auth_config.verified_tokens.get(key)
+        if cached is not None and cached[1] > now:
+            _auth_config.verified_tokens.move_to_end(key)
+            return cached[0]
+
+    username = decode_signed_value(secret, token_name, token, max_age_days=expire_days)
+    if not username:
+        return None
+    username = username.decode('utf8')
+    timestamp = _token_timestamp(token)
+    if timestamp is not None:
+        with _auth_config.lock:
+            _auth_config.max_expire_days = max(_auth_config.max_expire_days, expire_days)
+            _auth_config.verified_tokens[key] = (username, timestamp + expire_days * 86400)
+            while len(_auth_config.verified_tokens) > _auth_config.token_cache_size:
+                _auth_config.verified_tokens.popitem(last=False)
+    return username
+
+
+def _run_verify_func(verify_func: Callable, *args):
+    """Run the verify function in thread-based session, the function can be a coroutine function"""
+    if inspect.iscoroutinefunction(verify_func):
+        return _auth_executor.submit(asyncio.run, verify_func(*args)).result()
+    with _auth_slots:
+        return verify_func(*args)
+
+
+async def _run_verify_func_async(verify_func: Callable, *args):
+    if inspect.iscoroutinefunction(verify_func):
+        return await verify_func(*args)
+    return await asyncio.get_event_loop().run_in_executor(_auth_executor, verify_func, *args)
+
+
+def _throttle_keys(username: Optional[str] = None) -> List[tuple]:
+    keys = [('ip', session_info.user_ip)]
+    if username is not None:
+        keys.append(('user', username))
+    return keys
+
+
+def _check_throttle(keys: List[tuple], max_failed_attempts: Optional[int], throttle_period: float) -> float:
+    """Return the seconds to wait before the login attempt is allowed, show a toast if it's not allowed now"""
+    if not max_failed_attempts:
+        return 0
+    wait = _login_throttle.wait_time(keys, max_failed_attempts, throttle_period)
+    if wait > 0:
+        toast('Too many failed attempts, please try again in %d seconds' % (wait + 1), color='error')
+    return wait
+
+
+def _record_failure(keys: List[tuple], max_failed_attempts: Optional[int]):
+    if max_failed_attempts:
+        _login_throttle.record_failure(keys, max_failed_attempts)
+
+
 def basic_auth(verify_func: Callable[[str, str], bool], secret: Union[str, bytes],
-               expire_days=7, token_name='pywebio_auth_token') -> str:
+               expire_days=7, token_name='pywebio_auth_token', token_storage='localstorage',
+               max_failed_attempts: int = None, throttle_period: float = 300) -> str:
     """Persistence authentication with username and password.
 
     You need to provide a function to verify the current user based on username and password. The ``basic_auth()``
@@ -95,12 +657,24 @@ def basic_auth(verify_func: Callable[[str, str], bool], secret: Union[str, bytes
 
     :param callable verify_func: User authentication function. It should receive two arguments: username and password.
         If the authentication is successful, it should return ``True``, otherwise return ``False``.
+        It can also be a coroutine function. At most 4 verifications are run at the same time.
+        In coroutine-based session, a normal function is run in a thread pool, so a slow verification
+        (e.g. bcrypt, LDAP) doesn't block the server, but it can't call the PyWebIO functions.
     :param str secret: HMAC secret for the signature. It should be a long, random str.
     :param int expire_days: how many days the auth state can keep valid.
        After this time, authed users need to log in again.
     :param str token_name: the name of the token to store the auth state in user browser.
+    :param str token_storage: where to store the token in user browser, ``'localstorage'`` or ``'cookie'``.
+       The token in cookie is sent to server when the session is created,
+       so it can be verified without a round trip to the browser.
+    :param int max_failed_attempts: The max failed login attempts of a username or a client IP in
+       ``throttle_period`` seconds. When exceeded, the login attempts are rejected without calling ``verify_func``
+       until the period passes. ``None`` means no limit.
+    :param float throttle_period: The period in seconds of ``max_failed_attempts``.
     :return str: username of the current authed user
 
+    In coroutine-based session, ``basic_auth()`` returns an awaitable object, use ``await basic_auth(...)``.
+
     Example:
 
     .. exportable-codeblock::
@@ -113,34 +687,82 @@ def basic_auth(verify_func: Callable[[str, str], bool], secret: Union[str, bytes
 
 
     .. versionadded:: 0.4
+
+    .. versionchanged:: 0.8
+       add ``token_storage``, ``max_failed_attempts`` and ``throttle_period`` parameters,
+       support coroutine function as ``verify_func`` and coroutine-based session.
+       In coroutine-based session, a normal ``verify_func`` is run in a thread pool.
     """
+    args = (verify_func, secret, expire_days, token_name, token_storage, max_failed_attempts, throttle_period)
+    if _in_coroutine_session():
+        return _basic_auth_async(*args)
 
-    token = get_localstorage(token_name)  # get token from user's web browser
+    token = _get_token(token_name, token_storage)  # get token from user's web browser
     # try to decrypt the username from the token
-    username = decode_signed_value(secret, token_name, token, max_age_days=expire_days)
+    username = _decode_token(secret, token_name, token, expire_days)
     if username:
-        username = username.decode('utf8')
-    if not token or not username:  # no token or token validation failed
+        _save_session_token(token_name, token, expire_days)
+    else:  # no token or token validation failed
         while True:
-            user = input_group('Login', [
-                input("Username", name='username'),
-                input("Password", type=PASSWORD, name='password'),
-            ])
+            user = input_group('Login', _login_inputs())
             username = user['username']
-            ok = verify_func(username, user['password'])
-            if ok:
-                # encrypt username to token
-                signed = create_signed_value(secret, token_name, username).decode("utf-8")
-                set_localstorage(token_name, signed)  # set token to user's web browser
+            keys = _throttle_keys(username)
+            if _check_throttle(keys, max_failed_attempts, throttle_period):
+                continue
+            if _run_verify_func(verify_func, username, user['password']):
+                _on_login(username, secret, token_name, token_storage, expire_days)
                 break
-            else:
-                toast('Username or password is incorrect', color='error')
+            _record_failure(keys, max_failed_attempts)
+            toast('Username or password is incorrect', color='error')
+
+    return username
+
+
+def _login_inputs():
+    return [
+        input("Username", name='username'),
+        input("Password", type=PASSWORD, name='password'),
+    ]
+
+
+def _on_login(username: str, secret, token_name: str, token_storage: str, expire_days):
+    _login_throttle.reset(('user', username))
+    # encrypt username to token
+    signed = create_signed_value(secret, token_name, username).decode("utf-8")
+    _set_token(token_name, signed, token_storage, expire_days)  # set token to user's web browser
+    _save_session_token(token_name, signed, expire_days)
+
+
+def _save_session_token(token_name: str, token: str, expire_days):
+    """Remember the token of the session and its valid days, so that it can be revoked by `revoke_auth()`"""
+    get_current_session().internal_save.setdefault('auth_tokens', {})[token_name] = (token, expire_days)
+
+
+async def _basic_auth_async(verify_func, secret, expire_days, token_name, token_storage,
+                            max_failed_attempts, throttle_period) -> str:
+    token = await _maybe_await(_get_token(token_name, token_storage))
+    username = _decode_token(secret, token_name, token, expire_days)
+    if username:
+        _save_session_token(token_name, token, expire_days)
+    else:
+        while True:
+            user = await input_group('Login', _login_inputs())
+            username = user['username']
+            keys = _throttle_keys(username)
+            if _check_throttle(keys, max_failed_attempts, throttle_period):
+                continue
+            if await _run_verify_func_async(verify_func, username, user['password']):
+                _on_login(username, secret, token_name, token_storage, expire_days)
+                break
+            _record_failure(keys, max_failed_attempts)
+            toast('Username or password is incorrect', color='error')
 
     return username
 
 
 def custom_auth(login_func: Callable[[], str], secret=Union[str, bytes], expire_days=7,
-                token_name='pywebio_auth_token') -> str:
+                token_name='pywebio_auth_token', token_storage='localstorage',
+                max_failed_attempts: int = None, throttle_period: float = 300) -> str:
     """Persistence authentication with custom logic.
 
     You need to provide a function to determine the current user and return the username. The ``custom_auth()``
@@ -149,39 +771,136 @@ def custom_auth(login_func: Callable[[], str], secret=Union[str, bytes], expire_
 
     :param callable login_func: User login function. It should receive no arguments and return the username of the
         current user. If fail to verify the current user, it should return ``None``.
+        In coroutine-based session, it can also be a coroutine function.
     :param str secret: HMAC secret for the signature. It should be a long, random str.
     :param int expire_days: how many days the auth state can keep valid.
        After this time,authed users need to log in again.
     :param str token_name: the name of the token to store the auth state in user browser.
+    :param str token_storage: where to store the token in user browser, ``'localstorage'`` or ``'cookie'``.
+       See `basic_auth()`.
+    :param int max_failed_attempts: The max failed login attempts of a client IP in ``throttle_period`` seconds.
+       See `basic_auth()`.
+    :param float throttle_period: The period in seconds of ``max_failed_attempts``.
     :return str: username of the current authed user.
 
+    In coroutine-based session, ``custom_auth()`` returns an awaitable object, use ``await custom_auth(...)``.
+
     .. versionadded:: 0.4
+
+    .. versionchanged:: 0.8
+       add ``token_storage``, ``max_failed_attempts`` and ``throttle_period`` parameters,
+       support coroutine-based session
     """
+    args = (login_func, secret, expire_days, token_name, token_storage, max_failed_attempts, throttle_period)
+    if _in_coroutine_session():
+        return _custom_auth_async(*args)
 
-    token = get_localstorage(token_name)  # get token from user's web browser
+    token = _get_token(token_name, token_storage)  # get token from user's web browser
     # try to decrypt the username from the token
-    username = decode_signed_value(secret, token_name, token, max_age_days=expire_days)
+    username = _decode_token(secret, token_name, token, expire_days)
     if username:
-        username = username.decode('utf8')
-    if not token or not username:  # no token or token validation failed
+        _save_session_token(token_name, token, expire_days)
+    else:  # no token or token validation failed
+        keys = _throttle_keys()
         while True:
+            wait = _check_throttle(keys, max_failed_attempts, throttle_period)
+            if wait:
+                time.sleep(wait)
+                continue
+            # `login_func` usually interacts with the user, so it's run in the session thread
             username = login_func()
             if username:
-                # encrypt username to token
-                signed = create_signed_value(secret, token_name, username).decode("utf-8")
-                set_localstorage(token_name, signed)  # set token to user's web browser
+                _on_login(username, secret, token_name, token_storage, expire_days)
                 break
-            else:
-                toast('Authentication failed', color='error')
+            _record_failure(keys, max_failed_attempts)
+            toast('Authentication failed', color='error')
+
+    return username
+
+
+async def _custom_auth_async(login_func, secret, expire_days, token_name, token_storage,
+                             max_failed_attempts, throttle_period) -> str:
+    token = await _maybe_await(_get_token(token_name, token_storage))
+    username = _decode_token(secret, token_name, token, expire_days)
+    if username:
+        _save_session_token(token_name, token, expire_days)
+    else:
+        keys = _throttle_keys()
+        while True:
+            wait = _check_throttle(keys, max_failed_attempts, throttle_period)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            username = await _maybe_await(login_func())
+            if username:
+                _on_login(username, secret, token_name, token_storage, expire_days)
+                break
+            _record_failure(keys, max_failed_attempts)
+            toast('Authentication failed', color='error')
 
     return username
 
 
-def revoke_auth(token_name='pywebio_auth_token'):
+def revoke_auth(token_name='pywebio_auth_token', token_storage='localstorage', expire_days: Optional[float] = None):
     """Revoke the auth state of current user
 
+    The token is also added to the server side revocation store (see `config_auth()`),
+    so a leaked copy of the token can't be used any more.
+
     :param str token_name: the name of the token to store the auth state in user browser.
+    :param str token_storage: where the token is stored in user browser, ``'localstorage'`` or ``'cookie'``.
+    :param float expire_days: the ``expire_days`` used in `basic_auth()`/`custom_auth()`, the token is kept in the
+        revocation store until it expires. Default is the one used when the user logged in in current session,
+        or the max ``expire_days`` of the tokens verified in current process.
+
+    In coroutine-based session, an awaitable is returned, awaiting it waits until the token is revoked.
+    The token is revoked even if the returned object is not awaited.
 
     .. versionadded:: 0.4
+
+    .. versionchanged:: 0.8
+       add ``token_storage`` and ``expire_days`` parameters, revoke the token in server side,
+       return an awaitable in coroutine-based session
     """
-    set_localstorage(token_name, '')
+    token, saved_expire_days = get_current_session().internal_save.get('auth_tokens', {}).pop(token_name, (None, None))
+    if expire_days is None:
+        expire_days = saved_expire_days
+    if token is None:
+        token = _get_token(token_name, token_storage)
+    if not inspect.isawaitable(token):
+        _revoke_token(token, expire_days)
+        _set_token(token_name, '', token_storage, None)
+        if _in_coroutine_session():  # keep it awaitable
+            done = asyncio.get_event_loop().create_future()
+            done.set_result(None)
+            return done
+        return
+
+    # coroutine-based session, the token is read from the browser
+    done = asyncio.get_event_loop().create_future()
+
+    async def revoke():
+        try:
+            _revoke_token(await token, expire_days)
+            _set_token(token_name, '', token_storage, None)
+        except Exception as e:
+            done.set_exception(e)
+        else:
+            done.set_result(None)
+
+    # run as a task of the session, so the token is revoked even if the caller doesn't await
+    run_async(revoke())
+    return done
+
+
+def _revoke_token(token: Optional[str], expire_days: Optional[float] = None):
+    if not token:
+        return
+    if expire_days is None:
+        expire_days = _auth_config.max_expire_days
+    timestamp = _token_timestamp(token)
+    expires_at = (timestamp if timestamp is not None else time.time()) + expire_days * 86400
+    _auth_config.revocation_store.add(_token_id(token), expires_at)
+    with _auth_config.lock:
+        for key in [key for key in _auth_config.verified_tokens if key[2] == token]:
+            del _auth_config.verified_tokens[key]
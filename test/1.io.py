@@ -38,12 +38,22 @@ def target():
 
     ######### run_shell
     run_shell("""python3 -c 'print("hello world")'""")
+    assert run_shell("printf 'progress\\r'; exit 3", flush_interval=0.1) == 3
 
     ######### put_logbox,logbox_append
     put_logbox('log')
     for i in range(10):
         logbox_append('log', str(i) * 10 + '\n')
 
+    put_logbox('buffered_log', flush_interval=0.1)
+    for i in range(100):
+        logbox_append('buffered_log', str(i) + '\n')
+    logbox_flush('buffered_log')
+
+    put_logbox('bounded_log', max_lines=5)
+    for i in range(20):
+        logbox_append('bounded_log', 'line%s\n' % i)
+
     put_text('All test passed')
 
 
@@ -70,6 +80,7 @@ def test(server_proc: Popen, browser: Browser, context: BrowserContext, page: Pa
 
     time.sleep(1)
     assert 'redirect_stdout' in page.inner_text('body')
+    assert page.inner_text('#webio-logbox-bounded_log').split() == ['line%s' % i for i in range(15, 20)]
     assert 'All test passed' in page.inner_text('body')
 
 
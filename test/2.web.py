@@ -11,22 +11,30 @@ def target():
     if get_query('a'):
         assert get_query('a') == '1'
         assert 'b' in get_all_query()
+        assert get_query('c', multiple=True) == ['3', '4']
+        assert get_all_query(multiple=True)['a'] == ['1']
         assert get_localstorage('pywebio') == 'awesome'
         assert get_cookie('pywebio') == 'awesome'
+        assert get_localstorage_many(['pywebio', 'k1', 'none']) == {'pywebio': 'awesome', 'k1': 'v1', 'none': None}
+        assert get_cookie_many(['pywebio', 'k2']) == {'pywebio': 'awesome', 'k2': 'v2'}
+        state = local_state()
+        assert state['k1'] == 'v1' and 'none' not in state
 
         put_text('All test passed')
         return
 
     set_localstorage('pywebio', 'awesome')
     set_cookie('pywebio', 'awesome')
+    set_localstorage_many({'k1': 'v1'})
+    set_cookie_many({'k2': 'v2'})
     user = basic_auth(lambda u, p: u == p == 'pywebio', secret='secret')
     assert user == 'pywebio'
 
     url = eval_js('window.location.href')
     if '?' in url:
-        url += '&a=1&b=2&c=3'
+        url += '&a=1&b=2&c=3&c=4'
     else:
-        url += '?a=1&b=2&c=3'
+        url += '?a=1&b=2&c=3&c=4'
 
     run_js('window.location.href=url', url=url)
 
@@ -0,0 +1,67 @@
+"""
+Benchmark of the directory listing of file_picker on large synthetic directories.
+
+python bench_file_picker.py [number of files]
+"""
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from pywebio_battery.file_picker import scan_dir
+
+
+def legacy_path_info(path: pathlib.Path, accept='', show_hidden_files=False):
+    """The pathlib based implementation of `FilePicker.path_info()` before the `os.scandir()` rewrite"""
+    files = []
+    for f in path.iterdir():
+        if not show_hidden_files and f.name.startswith('.'):
+            continue
+        if f.is_dir() or f.name.lower().endswith(accept):
+            file = {
+                "id": str(f),
+                "name": f"{f.name}" if f.is_file() else f"📁 {f.name}/",
+            }
+            try:
+                file.update({
+                    "size": str(f.stat().st_size) if f.is_file() else '--',
+                    "date_modified": datetime.fromtimestamp(f.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                })
+            except Exception:
+                pass
+            files.append(file)
+    files.sort(key=lambda f: (f["name"][0] != "📁", f["name"].lower()))
+    return files
+
+
+def make_dir(root: str, n_files: int):
+    for i in range(n_files // 10):
+        os.mkdir(os.path.join(root, 'dir_%s' % i))
+    for i in range(n_files):
+        with open(os.path.join(root, 'file_%s.txt' % i), 'w') as f:
+            f.write('x' * (i % 100))
+
+
+def bench(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as root:
+        make_dir(root, n_files)
+        legacy = bench(legacy_path_info, pathlib.Path(root))
+        current = bench(scan_dir, root)
+        print("%s entries: pathlib %.3fs, scandir %.3fs, speedup %.1fx" % (
+            n_files + n_files // 10, legacy, current, legacy / current))
+
+
+if __name__ == '__main__':
+    main()
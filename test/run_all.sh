@@ -11,4 +11,6 @@ do
   python3 "$file" auto || exit_code=1
 done
 
+python3 -m pytest -q ./test_*.py || exit_code=1
+
 exit "$exit_code"
\ No newline at end of file
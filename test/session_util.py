@@ -0,0 +1,93 @@
+"""
+Run PyWebIO app functions in a session without browser, used by the unit tests.
+"""
+import asyncio
+import threading
+
+from pywebio.session import register_session_implement
+from pywebio.session.coroutinebased import CoroutineBasedSession
+from pywebio.session.threadbased import ThreadBasedSession
+
+register_session_implement(ThreadBasedSession)
+register_session_implement(CoroutineBasedSession)
+
+
+def _session_info(request, user_ip):
+    return dict(user_agent=None, user_language='en', server_host='localhost:8080', origin='', user_ip=user_ip,
+                backend='tornado', protocol='websocket', request=request)
+
+
+def _js_replies(commands, js):
+    """Return the ``js_yield`` events of the ``eval_js()`` calls in the commands, ``js(code, args)`` gives the result"""
+    return [dict(event='js_yield', task_id=cmd['task_id'], data=js(cmd['spec']['code'], cmd['spec']['args']))
+            for cmd in commands if cmd['command'] == 'run_script' and cmd['spec'].get('eval')]
+
+
+def run_in_session(target, request=None, user_ip='127.0.0.1', js=None, timeout=10, wait_close=False):
+    """Run ``target()`` in a thread-based session, return the messages sent to the browser.
+    The exception raised in ``target`` is re-raised.
+
+    :param js: ``js(code, args)`` returns the result of ``eval_js()`` in the session.
+    :param wait_close: wait until the session sends ``close_session`` to the browser, rather than ``target()`` returns.
+    """
+    messages, errors = [], []
+    done, closed = threading.Event(), threading.Event()
+
+    def main():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # don't wait the session to close, the session will be held when there are callbacks registered
+            done.set()
+
+    def on_task_command(session):
+        commands = session.get_task_commands()
+        messages.extend(commands)
+        if any(cmd['command'] == 'close_session' for cmd in commands):
+            closed.set()
+        for event in _js_replies(commands, js) if js else []:
+            session.send_client_event(event)
+
+    session = ThreadBasedSession(main, _session_info(request, user_ip), on_task_command=on_task_command)
+    finished = (closed if wait_close else done).wait(timeout)
+    session.close(nonblock=True)
+    assert finished, "session not finished in %s seconds" % timeout
+    if errors:
+        raise errors[0]
+    return messages
+
+
+def run_in_coroutine_session(target, request=None, user_ip='127.0.0.1', js=None, timeout=10):
+    """Run coroutine function ``target()`` in a coroutine-based session, the same as `run_in_session()`"""
+    messages, errors = [], []
+
+    async def main():
+        try:
+            await target()
+        except Exception as e:
+            errors.append(e)
+
+    async def run():
+        loop = asyncio.get_event_loop()
+        CoroutineBasedSession.event_loop_thread_id = threading.current_thread().ident
+        done = asyncio.Event()
+
+        def on_task_command(session):
+            commands = session.get_task_commands()
+            messages.extend(commands)
+            for event in _js_replies(commands, js) if js else []:
+                loop.call_soon(session.send_client_event, event)
+
+        session = CoroutineBasedSession(main, _session_info(request, user_ip), on_task_command=on_task_command,
+                                        on_session_close=done.set)
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        finally:
+            session.close()
+
+    asyncio.run(run())
+    if errors:
+        raise errors[0]
+    return messages
@@ -0,0 +1,334 @@
+"""
+Unit tests of the file picker that don't need a browser, run with ``pytest``.
+"""
+import os
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+
+import pywebio_battery
+from session_util import run_in_session
+
+fp = sys.modules['pywebio_battery.file_picker']
+
+
+def make_tree(root, files):
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+
+def test_relative_root(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a.py': b'', 'sub/b.py': b''})
+    monkeypatch.chdir(tmp_path)
+    result = {}
+
+    def target():
+        picker = fp.FilePicker('.', multiple=True)
+        picker.change_dir_or_add_file(str(tmp_path / 'sub'))
+        assert picker.current_path == tmp_path / 'sub'
+        row_ids = [row['id'] for row in picker.row_index.values() if not row['is_dir']]
+        picker.change_dir_or_add_file(row_ids[0])
+        result['selected'] = list(picker.selected_files)
+
+    run_in_session(target)
+    assert result['selected'] == [os.path.join('sub', 'b.py')]
+
+
+def test_relative_root_search(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a.py': b'', 'sub/b.py': b''})
+    monkeypatch.chdir(tmp_path)
+    result = {}
+
+    def target():
+        picker = fp.FilePicker('.', multiple=True, search=True)
+        picker.search_files('b.py')
+        row_ids = [row['id'] for row in picker.row_index.values() if not row['is_dir']]
+        assert row_ids == [str(tmp_path / 'sub' / 'b.py')]
+        picker.change_dir_or_add_file(row_ids[0])
+        result['selected'] = list(picker.selected_files)
+
+    run_in_session(target)
+    assert result['selected'] == [os.path.join('sub', 'b.py')]
+
+
+def test_leave_search(tmp_path):
+    make_tree(tmp_path, {'a.py': b'', 'sub/b.py': b''})
+    loaded = []
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), search=True)
+        picker.search_files('b.py')
+        load_dir = picker.load_dir
+        picker.load_dir = lambda path: loaded.append(path) or load_dir(path)
+        picker.change_dir_or_add_file(str(tmp_path / 'sub'))
+        picker.search_files('')  # the search box is cleared
+        picker.search_files('b.py')
+        picker.search_files(' ')  # the user clears the search box
+        assert not picker.searching
+
+    run_in_session(target)
+    assert loaded == [tmp_path / 'sub', tmp_path / 'sub']
+
+
+def test_folder_size_cache(tmp_path, monkeypatch):
+    root = tmp_path / 'a'
+    make_tree(root, {'x': b'1' * 10, 'b/y': b'1' * 20, 'b/c/z': b'1' * 30})
+    cache = fp.FolderSizeCache(str(tmp_path / 'sizes.db'))
+    assert cache.compute(str(root)) == 60
+
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or scandir(path))
+    assert cache.compute(str(root)) == 60
+    assert scanned == []  # all folders are unchanged
+
+    make_tree(root, {'b/c/new': b'1' * 40})  # only the mtime of the deepest folder changes
+    assert cache.compute(str(root)) == 100
+    assert scanned == [str(root / 'b' / 'c')]
+    assert cache.compute(str(root / 'b')) == 90
+
+
+def test_open_archive_member(tmp_path):
+    make_tree(tmp_path / 'src', {'a.txt': b'a', 'sub/b.txt': b'b'})
+    with tarfile.open(tmp_path / 'x.tgz', 'w:gz') as tf:
+        tf.add(tmp_path / 'src', arcname='.')  # the member names start with './', as `tar czf x.tgz .`
+    with zipfile.ZipFile(tmp_path / 'x.zip', 'w') as zf:
+        zf.write(tmp_path / 'src' / 'sub' / 'b.txt', 'sub/b.txt')
+
+    index = fp.get_archive_index(str(tmp_path / 'x.tgz'))
+    assert set(index.dirs['']) == {'a.txt', 'sub'} and index.is_file('sub/b.txt')
+    location = pywebio_battery.split_archive_path(tmp_path / 'x.zip' / 'sub' / 'b.txt')
+    assert location == (str(tmp_path / 'x.zip'), 'sub/b.txt')
+    with pywebio_battery.open_file(tmp_path / 'x.tgz' / 'sub' / 'b.txt') as f:
+        assert f.read() == b'b'
+    assert f.archive.closed
+    with pywebio_battery.open_file(tmp_path / 'x.zip' / 'sub' / 'b.txt') as f:
+        assert f.read() == b'b'
+    with pytest.raises(FileNotFoundError):
+        pywebio_battery.open_file(tmp_path / 'x.zip' / 'sub' / 'c.txt')
+
+
+def test_list_corrupted_archive(tmp_path):
+    make_tree(tmp_path, {'bad.zip': b'not a zip'})
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), browse_archives=True)
+        picker.change_dir_or_add_file(str(tmp_path / 'bad.zip'))
+        return picker
+
+    messages = run_in_session(target)
+    toasts = [msg['spec']['content'] for msg in messages if msg['command'] == 'toast']
+    assert toasts and toasts[-1].startswith("Can't list the folder")
+
+
+def test_preview_not_blocking(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a.jpg': b''})
+    monkeypatch.setattr(fp.ThumbnailCache, 'kind', staticmethod(lambda path: 'image'))
+    monkeypatch.setattr(fp.thumbnail_cache, 'get', lambda path: time.sleep(1) or b'thumbnail')
+    result = {}
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), preview=True)
+        start = time.monotonic()
+        picker.on_select(str(tmp_path / 'a.jpg'))
+        result['elapsed'] = time.monotonic() - start
+        time.sleep(1.5)
+
+    messages = run_in_session(target)
+    assert result['elapsed'] < 0.5
+    outputs = [str(msg['spec']) for msg in messages if msg['command'] == 'output']
+    button = next(i for i, spec in enumerate(outputs) if 'Select File (a.jpg)' in spec)
+    image = next(i for i, spec in enumerate(outputs) if '<img' in spec)
+    assert button < image
+
+
+def test_search_index(tmp_path):
+    make_tree(tmp_path, {'readme.md': b'', 'src/main.py': b'', 'src/util.py': b'', 'docs/main.md': b'',
+                         '.git/main': b''})
+    index = fp.SearchIndex(str(tmp_path))
+    index.refresh()
+    assert index.ready
+
+    def names(query, accept=''):
+        return [(os.path.relpath(path, tmp_path), is_dir) for path, is_dir in index.search(query, accept)]
+
+    assert sorted(names('MAIN')) == [(os.path.join('docs', 'main.md'), False), (os.path.join('src', 'main.py'), False)]
+    assert names('main', accept='.py') == [(os.path.join('src', 'main.py'), False)]
+    assert names('sr') == [('src', True)]
+    assert names('til') == [(os.path.join('src', 'util.py'), False)]  # substring match
+    assert names('') == []
+
+    make_tree(tmp_path, {'src/new.py': b''})
+    index.refresh()
+    assert names('new') == [(os.path.join('src', 'new.py'), False)]
+
+
+def test_search_index_lru(monkeypatch, tmp_path):
+    monkeypatch.setattr(fp, '_search_indexes', fp.OrderedDict())
+    first = fp.get_search_index(tmp_path / 'a', max_entries=2)
+    fp.get_search_index(tmp_path / 'b', max_entries=2)
+    assert fp.get_search_index(tmp_path / 'a', max_entries=2) is first
+    fp.get_search_index(tmp_path / 'c', max_entries=2)
+    assert [key[0] for key in fp._search_indexes] == [str(tmp_path / 'a'), str(tmp_path / 'c')]
+
+
+def test_dir_listing_cache(tmp_path):
+    make_tree(tmp_path, {'a.py': b'', 'b.txt': b'', '.hidden': b'', 'sub/c.py': b''})
+    cache = fp.DirListingCache(max_entries=2)
+    rows = cache.get(tmp_path, '.py', False)
+    assert [(row['name'], row['is_dir']) for row in rows] == [('📁 sub/', True), ('a.py', False)]
+    assert cache.get(str(tmp_path), '.py', False) is rows
+    assert cache.stats() == dict(hits=1, misses=1, entries=1)
+
+    make_tree(tmp_path, {'d.py': b''})  # the mtime of the folder changes
+    assert 'd.py' in [row['name'] for row in cache.get(tmp_path, '.py', False)]
+    assert cache.stats()['misses'] == 2
+
+    cache.get(tmp_path, '', True)
+    cache.get(tmp_path / 'sub', '', False)
+    assert cache.stats()['entries'] == 2  # the least recently used listing is evicted
+
+    cancel = threading.Event()
+    cancel.set()
+    cache.clear()
+    cache.get(tmp_path, '', False, cancel=cancel)
+    assert cache.stats()['entries'] == 0  # the cancelled listing is not cached
+
+
+def test_prefetch(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a/x': b'', 'b/y': b'', 'c/z': b''})
+    cache = fp.DirListingCache()
+    monkeypatch.setattr(fp, 'listing_cache', cache)
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), prefetch=2)
+        deadline = time.monotonic() + 5
+        while cache.stats()['entries'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        picker.close()
+
+    run_in_session(target)
+    assert cache.stats()['entries'] == 3  # the root folder and 2 sub folders
+
+
+def test_scan_dir(tmp_path):
+    make_tree(tmp_path, {'b.py': b'12', 'A.py': b'1', 'c.txt': b'', '.hidden.py': b'', 'sub/x': b''})
+    rows = fp.scan_dir(tmp_path, accept=('.py',))
+    assert [row['name'] for row in rows] == ['📁 sub/', 'A.py', 'b.py']  # folders first, then by name
+    assert [row['bytes'] for row in rows[1:]] == [1, 2]
+    assert all(row['id'] == str(tmp_path / row['name']) for row in rows[1:])
+    assert '.hidden.py' in [row['name'] for row in fp.scan_dir(tmp_path, '.py', show_hidden_files=True)]
+
+
+def test_lazy_view_rows(tmp_path):
+    make_tree(tmp_path, {'%s.txt' % name: b'1' * size for name, size in [('b', 3), ('a', 10), ('c', 2)]})
+    make_tree(tmp_path, {'sub/x': b''})
+    for mtime, name in enumerate(['c.txt', 'a.txt', 'b.txt']):
+        os.utime(tmp_path / name, (1e9 + mtime, 1e9 + mtime))
+    result = {}
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), lazy=True)
+        names = lambda rows: [row['name'] for row in rows]
+        result['default'] = names(picker.view_rows([], {}))
+        result['desc'] = names(picker.view_rows([{'colId': 'name', 'sort': 'desc'}], {}))
+        result['size'] = names(picker.view_rows([{'colId': 'size', 'sort': 'asc'}], {}))
+        result['date'] = names(picker.view_rows([{'colId': 'date_modified', 'sort': 'desc'}], {}))
+        result['filter'] = names(picker.view_rows([], {'name': {'type': 'contains', 'filter': 'B.'}}))
+        result['combined'] = names(picker.view_rows([], {'name': {
+            'operator': 'OR', 'condition1': {'type': 'startsWith', 'filter': 'a'},
+            'condition2': {'type': 'endsWith', 'filter': 'c.txt'}}}))
+        picker.serve_rows({'req': 1, 'start': 1, 'end': 3, 'sort': [], 'filter': {}})
+
+    messages = run_in_session(target)
+    assert result['default'] == ['📁 sub/', 'a.txt', 'b.txt', 'c.txt']
+    assert result['desc'] == ['📁 sub/', 'c.txt', 'b.txt', 'a.txt']  # folders are kept first
+    assert result['size'] == ['📁 sub/', 'c.txt', 'b.txt', 'a.txt']  # '10 bytes' is the largest
+    assert result['date'] == ['📁 sub/', 'b.txt', 'a.txt', 'c.txt']
+    assert result['filter'] == ['b.txt']
+    assert result['combined'] == ['a.txt', 'c.txt']
+    served = [msg['spec']['args'] for msg in messages
+              if msg['command'] == 'run_script' and 'resolve_rows' in str(msg['spec']['args'])][-1]
+    assert [row['name'] for row in served['rows']] == ['a.txt', 'b.txt'] and served['last_row'] == 4
+    assert 'is_dir' not in served['rows'][0]  # the metadata is not sent to the browser
+
+
+def test_partial_listing(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a.txt': b'', 'b.txt': b''})
+    monkeypatch.setattr(fp, 'listing_cache', fp.DirListingCache())
+    scan_dir = fp.scan_dir
+
+    def slow_scan_dir(path, accept='', show_hidden_files=False, files=None, cancel=None):
+        rows = scan_dir(path, accept, show_hidden_files)
+        files.append(rows[0])  # the partial listing
+        time.sleep(0.5)
+        return rows
+
+    monkeypatch.setattr(fp, 'scan_dir', slow_scan_dir)
+    result = {}
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), listing_timeout=0.1)
+        result['partial'] = sorted(picker.row_index)
+        time.sleep(1)
+        result['full'] = sorted(picker.row_index)
+
+    messages = run_in_session(target)
+    assert result['partial'] == [str(tmp_path / 'a.txt')]
+    assert result['full'] == [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
+    assert any('partial results' in msg['spec']['content'] for msg in messages if msg['command'] == 'toast')
+
+
+def test_selected_files(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'%s.txt' % i: b'' for i in range(5)})
+    monkeypatch.setattr(fp.FilePicker, 'collapse_threshold', 3)
+    result = {}
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path), multiple=True)
+        paths = [tmp_path / ('%s.txt' % i) for i in (2, 0, 1)]
+        picker.add_files(paths)
+        picker.add_files(paths[:1])  # already selected
+        result['added'] = list(picker.selected_files)
+        picker.remove_file('0.txt')
+        result['removed'] = list(picker.selected_files)
+        picker.add_files([tmp_path / ('%s.txt' % i) for i in (3, 4)])
+        result['collapsed'] = picker.collapsed
+        picker.clear_files()
+        result['cleared'] = list(picker.selected_files)
+
+        single = fp.FilePicker(str(tmp_path))
+        single.add_files(paths[:2])
+        result['single'] = list(single.selected_files)
+
+    run_in_session(target)
+    assert result['added'] == ['2.txt', '0.txt', '1.txt']  # in the order of selection
+    assert result['removed'] == ['2.txt', '1.txt']
+    assert result['collapsed'] and result['cleared'] == []
+    assert result['single'] == ['0.txt']
+
+
+def test_select_from_listing_metadata(tmp_path, monkeypatch):
+    make_tree(tmp_path, {'a.txt': b'', 'sub/b.txt': b''})
+    result = {}
+
+    def target():
+        picker = fp.FilePicker(str(tmp_path))
+        checked = []
+        isdir = os.path.isdir
+        monkeypatch.setattr(os.path, 'isdir', lambda path: checked.append(path) or isdir(path))
+        result['is_dir'] = [picker.is_dir(str(tmp_path / 'sub')), picker.is_dir(str(tmp_path / 'a.txt'))]
+        result['checked'] = checked  # the paths in the listing are answered without touching the disk
+        monkeypatch.undo()
+        picker.on_select(str(tmp_path / 'sub'))
+
+    messages = run_in_session(target)
+    assert result['is_dir'] == [True, False] and result['checked'] == []
+    assert any('Open Folder (sub)' in str(msg['spec']) for msg in messages if msg['command'] == 'output')
@@ -0,0 +1,159 @@
+"""
+Unit tests of the interaction utilities that don't need a browser, run with ``pytest``.
+"""
+import sys
+import threading
+import time
+
+import pytest
+
+import pywebio_battery
+from session_util import run_in_session, run_in_coroutine_session
+
+interaction = sys.modules['pywebio_battery.interaction']
+
+
+def scripts(messages):
+    return [msg['spec'] for msg in messages if msg['command'] == 'run_script']
+
+
+def test_video_stream_backpressure():
+    def target():
+        interaction.put_video_stream('v', max_pending_bytes=10)
+        for _ in range(3):
+            interaction.video_stream_append('v', b'12345')
+
+    messages = run_in_session(target, js=lambda code, args: 2)
+    codes = [spec['code'] for spec in scripts(messages) if 'WebIOVideoStream.' in spec['code']]
+    assert codes == ['WebIOVideoStream.append(dom_id, content)'] * 2 + \
+           ['WebIOVideoStream.drain(dom_id, low_bytes)', 'WebIOVideoStream.append(dom_id, content)']
+
+
+def test_video_stream_coroutine_session():
+    pending = {}
+
+    async def target():
+        interaction.put_video_stream('v', max_pending_bytes=10)
+        with pytest.raises(RuntimeError):
+            interaction.video_stream_append('v', b'12345')
+        for _ in range(3):
+            await interaction.video_stream_append_async('v', b'12345')
+        pending['bytes'] = interaction._get_video_stream('v').pending_bytes
+
+    messages = run_in_coroutine_session(target, js=lambda code, args: 2)
+    drains = [spec for spec in scripts(messages) if spec['code'].startswith('WebIOVideoStream.drain')]
+    assert len(drains) == 1 and drains[0]['args']['low_bytes'] == 5
+    assert pending['bytes'] == 7
+
+
+def test_shell_job_queue_fifo():
+    queue = interaction._ShellJobQueue()
+    queue.set_limit(1, 'fifo')
+    reports = []
+    first = queue.acquire(0, reports.append)
+    started = []
+
+    def wait(priority):
+        job = queue.acquire(priority, reports.append)
+        started.append(priority)
+        queue.release(job)
+
+    threads = []
+    for priority in (5, 1):
+        threads.append(threading.Thread(target=wait, args=(priority,)))
+        threads[-1].start()
+        time.sleep(0.1)  # keep the enqueue order
+    assert queue.stats()['queued'] == 2 and queue.stats()['running'] == 1
+    queue.release(first)
+    for thread in threads:
+        thread.join(5)
+    assert started == [5, 1]
+    assert sorted(reports) == [1, 2]
+    assert queue.stats()['running'] == 0 and queue.stats()['started_jobs'] == 3
+
+
+def test_shell_job_queue_priority():
+    queue = interaction._ShellJobQueue()
+    queue.set_limit(1, 'fifo')
+    first = queue.acquire(0, print)
+    jobs = [queue._enqueue(priority, lambda: None) for priority in (5, 1, 3)]
+    assert [queue.position(job) for job in jobs] == [1, 2, 3]
+    queue.set_limit(1, 'priority')  # the waiting jobs are reordered
+    assert [queue.position(job) for job in jobs] == [3, 1, 2]
+
+    queue.release(jobs[2])  # a waiting job gives up
+    assert queue.stats()['queued'] == 2
+    queue.release(first)
+    assert jobs[1].granted and not jobs[0].granted
+    queue.set_limit(None, 'priority')
+    assert jobs[0].granted
+
+
+def test_run_shell_queued(monkeypatch):
+    queue = interaction._ShellJobQueue()
+    monkeypatch.setattr(interaction, '_shell_queue', queue)
+    queue.set_limit(1, 'fifo')
+    outputs, codes = [], []
+
+    def target():
+        codes.append(interaction.run_shell('echo hello', output_func=outputs.append))
+
+    holder = queue.acquire(0, print)
+    thread = threading.Thread(target=run_in_session, args=(target,))
+    thread.start()
+    time.sleep(0.3)
+    queue.release(holder)
+    thread.join(10)
+    assert codes == [0]
+    assert outputs[0].startswith('[Waiting') and ''.join(outputs[1:]).strip() == 'hello'
+
+
+def test_run_shell_streaming():
+    outputs, codes = [], []
+
+    def target():
+        cmd = "printf 'progress 1'; sleep 0.3; printf ' 2\\n'; printf 'x%.0s' $(seq 100)"
+        codes.append(interaction.run_shell(cmd, output_func=outputs.append, flush_interval=0.1, flush_size=40))
+
+    run_in_session(target)
+    assert codes == [0]
+    assert outputs[0] == 'progress 1'  # the output without newline is flushed in time
+    assert ''.join(outputs) == 'progress 1 2\n' + 'x' * 100
+
+
+def test_run_shell_async():
+    outputs, errors, codes = [], [], []
+
+    async def target():
+        codes.append(await interaction.run_shell_async('echo out; echo err >&2; exit 3', output_func=outputs.append,
+                                                       stderr_func=errors.append))
+        codes.append(await interaction.run_shell_async('sleep 10', output_func=outputs.append, timeout=0.2))
+
+    run_in_coroutine_session(target)
+    assert codes[0] == 3 and codes[1] < 0  # killed by signal when timeout
+    assert ''.join(outputs).strip() == 'out' and ''.join(errors).strip() == 'err'
+
+
+def test_run_shell_async_long_line():
+    outputs = []
+
+    async def target():
+        await interaction.run_shell_async("printf 'é%.0s' $(seq 100000); echo; echo next",
+                                          output_func=outputs.append)
+
+    run_in_coroutine_session(target)
+    assert ''.join(outputs) == 'é' * 100000 + '\nnext\n'  # 200,000 bytes line, longer than the 64 KiB limit
+    assert outputs[-1] == 'next\n'
+
+
+def test_logbox_flush_before_session_close():
+    def target():
+        pywebio_battery.put_logbox('log', flush_interval=0.1)
+        pywebio_battery.logbox_append('log', 'final line\n')
+
+    async def coro_target():
+        target()
+
+    for messages in (run_in_session(target, wait_close=True), run_in_coroutine_session(coro_target)):
+        assert messages[-1]['command'] == 'close_session'
+        assert scripts(messages)[-1]['args'] == {'text': 'final line\n'}
@@ -0,0 +1,90 @@
+"""
+Unit tests of the media server that don't need a browser, run with ``pytest``.
+"""
+import sys
+
+import pytest
+
+import pywebio_battery
+from session_util import run_in_session
+
+media = sys.modules['pywebio_battery.media']
+
+
+@pytest.mark.parametrize('header, size, expected', [
+    ('bytes=0-', 100, (0, 100)),
+    ('bytes=10-19', 100, (10, 20)),
+    ('bytes=90-200', 100, (90, 100)),
+    ('bytes=-10', 100, (90, 100)),
+    ('bytes=-200', 100, (0, 100)),
+    ('bytes=0-9, 20-29', 100, (0, 10)),  # only the first range is served
+    ('bytes=100-', 100, None),
+    ('bytes=20-10', 100, None),
+    ('bytes=a-b', 100, None),
+    ('items=0-9', 100, None),
+])
+def test_parse_range(header, size, expected):
+    assert media._parse_range(header, size) == expected
+
+
+class Request:
+    def __init__(self, protocol='http', **headers):
+        self.protocol = protocol
+        self.headers = headers
+
+
+@pytest.mark.parametrize('request_', [Request('https'), Request(**{'X-Forwarded-Proto': 'https'})])
+def test_standalone_server_refuses_https(request_, monkeypatch):
+    monkeypatch.setattr(media, '_server', media._MediaServer())
+
+    def target():
+        media._server.url('token/signature')
+
+    with pytest.raises(RuntimeError, match='HTTPS'):
+        run_in_session(target, request=request_)
+    assert media._server.bound_port is None
+
+
+def test_standalone_server_url(monkeypatch):
+    monkeypatch.setattr(media, '_server', media._MediaServer())
+    media._server.host = '127.0.0.1'
+    result = {}
+
+    def target():
+        result['url'] = media._server.url('token/signature')
+
+    run_in_session(target, request=Request())
+    assert result['url'] == '//localhost:%s/token/signature' % media._server.bound_port
+
+
+def test_media_source_closed(tmp_path):
+    (tmp_path / 'a.mp4').write_bytes(b'0123456789')
+    source = media._MediaSource(tmp_path / 'a.mp4', 'video/mp4')
+    assert source.read(2, 3) == b'234'
+    source.close()
+    assert source.read(2, 3) == b'' and source.mmap is None  # the file isn't mapped again
+
+
+def test_blob_cache():
+    cache = media._BlobCache(max_size=10)
+    first = cache.add(b'12345', 'video/mp4')
+    assert cache.add(b'12345', 'video/mp4') == first and cache.size == 5
+    assert cache.get(first) == (b'12345', 'video/mp4')
+    assert cache.get_base64(b'12345', first) == 'MTIzNDU='
+    assert cache.size == 13  # the encoded content is counted too
+
+    second = cache.add(b'abc', 'audio/mpeg')
+    assert cache.get(first) is None  # evicted, the least recently used
+    assert cache.get(second) == (b'abc', 'audio/mpeg') and cache.size == 3
+
+
+def test_blob_sent_once_per_session(monkeypatch):
+    monkeypatch.setattr(media, '_blob_cache', media._BlobCache(1024))
+
+    def target():
+        for dom_id in ('a', 'b'):
+            src, script = media._blob_src(b'content', 'video/mp4', dom_id)
+            assert src == '' and 'WebIOMediaCache' in script
+
+    messages = run_in_session(target)
+    assert len([msg for msg in messages if msg['command'] == 'run_script']) == 1
@@ -0,0 +1,254 @@
+"""
+Unit tests of the web utilities that don't need a browser, run with ``pytest``.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from tornado.web import create_signed_value
+
+import pywebio_battery
+from session_util import run_in_session, run_in_coroutine_session
+
+web = sys.modules['pywebio_battery.web']
+
+
+@pytest.fixture
+def auth_config():
+    web.config_auth(revocation_store=web.MemoryRevocationStore())
+    web._auth_config.max_expire_days = 31
+    yield web._auth_config
+    web.config_auth(revocation_store=web.MemoryRevocationStore())
+
+
+def make_token(username='alice', token_name='token', secret='secret', age_days=0):
+    clock = lambda: time.time() - age_days * 86400
+    return create_signed_value(secret, token_name, username, clock=clock).decode('utf8')
+
+
+def test_verified_token_cache(auth_config):
+    token = make_token(age_days=10)
+    assert web._decode_token('secret', 'token', token, 30) == 'alice'
+    assert ('secret', 'token', token, 30) in auth_config.verified_tokens
+    # the cached verification with a longer expire_days doesn't make the token valid with a shorter one
+    assert web._decode_token('secret', 'token', token, 5) is None
+    assert web._decode_token('wrong', 'token', token, 30) is None
+
+
+def test_revoke_token(auth_config):
+    token = make_token()
+    assert web._decode_token('secret', 'token', token, 30) == 'alice'
+    web._revoke_token(token, 30)
+    assert not auth_config.verified_tokens
+    assert web._decode_token('secret', 'token', token, 30) is None
+
+
+def test_revocation_outlives_token(auth_config):
+    token = make_token(age_days=40)
+    assert web._decode_token('secret', 'token', token, 90) == 'alice'
+    web._revoke_token(token)  # use the max expire_days of verified tokens
+    expires_at = auth_config.revocation_store.revoked[web._token_id(token)]
+    assert expires_at > time.time() + 49 * 86400
+    assert web._decode_token('secret', 'token', token, 90) is None
+
+
+def test_revoke_auth_uses_session_expire_days(auth_config):
+    token = make_token(age_days=40)
+
+    def target():
+        web._save_session_token('token', token, 90)
+        web.revoke_auth('token', token_storage='cookie')
+
+    run_in_session(target)
+    expires_at = auth_config.revocation_store.revoked[web._token_id(token)]
+    assert expires_at > time.time() + 49 * 86400
+
+
+def test_file_revocation_store(tmp_path):
+    path = str(tmp_path / 'revoked')
+    store, other = web.FileRevocationStore(path), web.FileRevocationStore(path)
+    store.add('a', time.time() + 100)
+    assert 'a' in other
+    other.add('b', time.time() + 100)
+    assert 'b' in store and 'c' not in store
+
+
+def test_file_revocation_store_compaction(tmp_path):
+    path = str(tmp_path / 'revoked')
+    with open(path, 'w') as f:
+        f.writelines('expired%s %s\n' % (i, time.time() - 1) for i in range(10))
+        f.write('valid %s\n' % (time.time() + 100))
+        f.write('incompl')
+    store = web.FileRevocationStore(path)
+    assert 'valid' in store and 'expired0' not in store
+    with open(path) as f:
+        assert f.read().split() == ['valid', str(store.revoked['valid'])]
+
+    store.add('new', time.time() + 100)
+    other = web.FileRevocationStore(path)
+    assert 'valid' in other and 'new' in other
+
+
+class Request:
+    def __init__(self, **headers):
+        self.headers = headers
+
+
+def test_query_from_referer():
+    result = {}
+
+    def target():
+        result['all'] = web.get_all_query()
+        result['a'] = web.get_query('a', multiple=True)
+
+    request = Request(Referer='http://localhost/?a=1&a=2&b=')
+    messages = run_in_session(target, request=request)
+    assert result == {'all': {'a': '2', 'b': ''}, 'a': ['1', '2']}
+    assert not [msg for msg in messages if msg['command'] == 'run_script']
+
+
+def test_query_coroutine_session():
+    result = {}
+
+    async def target():
+        result['a'] = await web.get_query('a')  # from eval_js
+        result['b'] = await web.get_query('b')  # cached
+        await web.refresh_query()
+        result['all'] = await web.get_all_query()
+
+    searches = iter(['?a=1', '?a=3&b=4'])
+    run_in_coroutine_session(target, request=Request(), js=lambda code, args: next(searches))
+    assert result == {'a': '1', 'b': None, 'all': {'a': '3', 'b': '4'}}
+
+    async def from_referer():
+        result['referer'] = await web.get_all_query()
+
+    run_in_coroutine_session(from_referer, request=Request(Referer='http://localhost/?c=5'))
+    assert result['referer'] == {'c': '5'}
+
+
+def test_cookie_from_request():
+    result = {}
+
+    def target():
+        result['a'] = web.get_cookie('a')
+        result['many'] = web.get_cookie_many(['a', 'b', 'c'])
+
+    run_in_session(target, request=Request(Cookie='a=1; b=2; a=3'))
+    assert result == {'a': '1', 'many': {'a': '1', 'b': '2', 'c': None}}
+
+
+def test_cookie_coroutine_session():
+    result = {}
+
+    async def target():
+        result['a'] = await web.get_cookie('a')
+        result['many'] = await web.get_cookie_many(['a', 'b'])
+
+    run_in_coroutine_session(target, request=Request(Cookie='a=1'))
+    assert result == {'a': '1', 'many': {'a': '1', 'b': None}}
+
+
+def last_script(messages):
+    return [msg for msg in messages if msg['command'] == 'run_script'][-1]['spec']
+
+
+def test_local_state():
+    result = {}
+
+    def target():
+        state = web.local_state(sync_delay=60)
+        assert web.local_state() is state
+        state['a'] = 2
+        del state['b']
+        state.sync()
+        result.update(state)
+
+    messages = run_in_session(target, js=lambda code, args: {'a': '1', 'b': '1'})
+    assert result == {'a': '2'}
+    assert last_script(messages)['args'] == {'changes': {'a': '2', 'b': None}}
+
+
+def test_local_state_coroutine_session():
+    result = {}
+
+    async def target():
+        state = await web.local_state()
+        assert await web.local_state() is state
+        state['a'] = 2
+        state.sync()
+        result.update(state)
+
+    messages = run_in_coroutine_session(target, js=lambda code, args: {'a': '1'})
+    assert result == {'a': '2'}
+    assert last_script(messages)['args'] == {'changes': {'a': '2'}}
+
+
+def test_local_state_sync_before_session_close():
+    def target():
+        web.local_state(sync_delay=0.2)['visits'] = 1
+
+    async def coro_target():
+        (await web.local_state(sync_delay=0.2))['visits'] = 1
+
+    for messages in (run_in_session(target, js=lambda code, args: {}, wait_close=True),
+                     run_in_coroutine_session(coro_target, js=lambda code, args: {})):
+        assert messages[-1]['command'] == 'close_session'
+        assert last_script(messages)['args'] == {'changes': {'visits': '1'}}
+
+
+def test_login_throttle():
+    throttle = web._LoginThrottle(max_keys=3)
+    keys = [('ip', '1.1.1.1'), ('user', 'alice')]
+    for _ in range(2):
+        assert throttle.wait_time(keys, 2, 60) == 0
+        throttle.record_failure(keys, 2)
+    assert 0 < throttle.wait_time(keys, 2, 60) <= 60
+    assert throttle.wait_time([('user', 'bob')], 2, 60) == 0
+    throttle.reset(('user', 'alice'))
+    assert throttle.wait_time([('user', 'alice')], 2, 60) == 0
+
+    for i in range(10):  # random usernames from the same IP
+        throttle.record_failure([('ip', '1.1.1.1'), ('user', 'user%s' % i)], 2)
+    assert len(throttle.failures) == 3
+    assert ('ip', '1.1.1.1') in throttle.failures
+
+
+def test_verify_func_in_session_thread():
+    result = {}
+
+    def verify(username, password):
+        result['session'] = web.get_current_session()
+        return password == 'secret'
+
+    def target():
+        result['ok'] = web._run_verify_func(verify, 'alice', 'secret')
+
+    run_in_session(target)
+    assert result['ok'] and result['session'] is not None
+
+
+def test_revoke_auth_coroutine_session(auth_config):
+    saved, stored, not_awaited = make_token('a'), make_token('b'), make_token('c')
+    revoked = lambda token: web._token_id(token) in auth_config.revocation_store
+
+    async def target():
+        web._save_session_token('token', saved, 7)
+        assert await web.revoke_auth('token') is None  # the token is known in the session
+        assert revoked(saved)
+
+        tokens.append(stored)
+        await web.revoke_auth('token')  # the token is read from the browser
+        assert revoked(stored)
+
+        tokens.append(not_awaited)
+        web.revoke_auth('token')  # the 0.4 style call still revokes the token
+        await asyncio.sleep(0.2)
+
+    tokens = []
+    messages = run_in_coroutine_session(target, js=lambda code, args: tokens[-1])
+    assert revoked(not_awaited)
+    clears = [msg for msg in messages if msg['command'] == 'run_script' and msg['spec']['args'].get('value') == '']
+    assert len(clears) == 3